@@ -177,6 +177,21 @@ def detect_tables_backend(doc_dir: Path, page: int):
         return "camelot:stream"
     return "unknown"
 
+def _iter_layout(doc_dir: Path):
+    """
+    Yield (page, layout, source) per page: from layout.jsonl (one line per page, written by
+    layout_detect), else from the older layout/page_*.json files.
+    """
+    layout_jsonl = doc_dir / "layout.jsonl"
+    if layout_jsonl.exists():
+        for line in layout_jsonl.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                layout = json.loads(line)
+                yield int(layout["page"]), layout, str(layout_jsonl)
+        return
+    for pj in sorted((doc_dir / "layout").glob("page_*.json")):
+        yield int(pj.stem.split("_")[1]), json.loads(pj.read_text(encoding="utf-8")), str(pj)
+
 # ----------------------------
 # Main builder (enriched)
 # ----------------------------
@@ -217,10 +232,10 @@ def build_for_document(doc_dir: Path):
     out_jsonl = STAGED_ROOT / f"{doc_id}.jsonl"
     out_md    = STAGED_ROOT / f"{doc_id}.md"
 
-    # Gather page JSONs
-    page_jsons = sorted(layout_dir.glob("page_*.json"))
-    if not page_jsons:
-        print(f"[skip] No layout for {doc_id} in {layout_dir}")
+    # Gather page layouts
+    page_layouts = list(_iter_layout(doc_dir))
+    if not page_layouts:
+        print(f"[skip] No layout for {doc_id} in {doc_dir}")
         return
 
     # Write JSONL
@@ -228,9 +243,7 @@ def build_for_document(doc_dir: Path):
         # Track a rolling 'section' per page (last Title seen on that page)
         page_to_section = {}
 
-        for pj in page_jsons:
-            page = int(pj.stem.split("_")[1])
-            layout = json.loads(pj.read_text(encoding="utf-8"))
+        for page, layout, layout_src in page_layouts:
             blocks = layout.get("blocks", [])
             layout_backend = layout.get("backend") or "unknown"
 
@@ -282,7 +295,7 @@ def build_for_document(doc_dir: Path):
                     "source_path": str(source_pdf) if source_pdf.exists() else None,
 
                     "provenance": {
-                        "layout_json": str(pj),
+                        "layout_json": layout_src,
                         "page_text":   str(pages_dir / f"page_{page}.txt"),
                         "words_jsonl": str(words_jsonl) if words_jsonl.exists() else None,
                         "ocr_log":     str(doc_dir / "ocr_pages.csv") if (doc_dir / "ocr_pages.csv").exists() else None,
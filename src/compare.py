@@ -7,6 +7,7 @@ import json
 import math
 import re
 import textwrap
+from functools import lru_cache
 from io import BytesIO
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
@@ -65,7 +66,30 @@ def render_pdf_page(pdf_path: Path, page_num: int, dpi=200) -> Image.Image:
     pix = page.get_pixmap(matrix=mat, alpha=False)
     return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
 
+@lru_cache(maxsize=8)
+def _parse_layout_jsonl(p: Path, mtime_ns: int) -> Dict[int, dict]:
+    """All page layouts from one layout.jsonl (one line per page); mtime_ns keys the cache."""
+    pages = {}
+    for line in p.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            layout = json.loads(line)
+            pages[int(layout["page"])] = layout
+    return pages
+
+def _layout_pages(doc_id: str) -> Dict[int, dict]:
+    """Page layouts of doc_id, parsed once per version of its layout.jsonl (reruns are picked up)."""
+    p = PARSED_DIR / doc_id / "layout.jsonl"
+    try:
+        mtime_ns = p.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return _parse_layout_jsonl(p, mtime_ns)
+
 def load_layout(doc_id: str, page: int) -> dict:
+    pages = _layout_pages(doc_id)
+    if pages:
+        return pages.get(page) or {"blocks": [], "backend": "missing"}
+    # older layout_detect output: one JSON file per page
     p = PARSED_DIR / doc_id / "layout" / f"page_{page}.json"
     return json.loads(p.read_text(encoding="utf-8")) if p.exists() else {"blocks": [], "backend": "missing"}
 
@@ -15,16 +15,79 @@ Creates:
 - sections/*.md: Section summaries
 """
 
+import argparse
 import json
 import csv
 import os
+from collections import defaultdict
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import hashlib
 from datetime import datetime
 import pandas as pd
 import re
 
+try:
+    import orjson
+except ImportError:  # fall back to stdlib json
+    orjson = None
+
+# SEC section keywords in priority order; _classify returns an index into this
+_SECTION_KEYWORDS = (
+    (("risk factor",), "risk_factors"),
+    (("management discussion", "md&a"), "md&a"),
+    (("financial statement",), "financial_statements"),
+    (("business overview",), "business_overview"),
+)
+_SECTION_RE = re.compile(
+    "|".join(re.escape(k) for keywords, _ in _SECTION_KEYWORDS for k in keywords),
+    re.IGNORECASE,
+)
+
+def _classify(text: str) -> int:
+    """Return the _SECTION_KEYWORDS code for text, or -1 if no keyword matches"""
+    # One C-level scan rejects the common case (plain body text) without a lowercase copy
+    if not text or _SECTION_RE.search(text) is None:
+        return -1
+    text_lower = text.lower()
+    for code, (keywords, _label) in enumerate(_SECTION_KEYWORDS):
+        if any(k in text_lower for k in keywords):
+            return code
+    return -1
+
+@dataclass(slots=True)
+class MetadataRecord:
+    """One provenance record; only turned into a dict when written out"""
+    doc_id: str
+    company: str
+    fiscal_year: str
+    filing_type: str
+    page: Any
+    section: str
+    block_type: str
+    bbox: Dict
+    text: str
+    text_full_length: int
+    source_path: str
+    item_index: int
+    extraction_timestamp: str
+    extraction_method: str = "docling"
+    table_info: Optional[Dict] = None
+    figure_info: Optional[Dict] = None
+
+    def to_dict(self) -> Dict:
+        """Plain dict for JSON output (table_info/figure_info only when set)"""
+        out = {}
+        for name in _RECORD_FIELDS:
+            value = getattr(self, name)
+            if value is None and name in ("table_info", "figure_info"):
+                continue
+            out[name] = value
+        return out
+
+_RECORD_FIELDS = tuple(f.name for f in fields(MetadataRecord))
+
 class EnhancedDoclingMetadataProcessor:
     def __init__(self, base_path: str = "data/parsed/docling"):
         """Initialize processor with Docling base path"""
@@ -76,14 +139,13 @@ class EnhancedDoclingMetadataProcessor:
                 return json.load(f)
         return {}
     
-    def load_table_csv(self, doc_name: str, table_idx: int) -> Dict:
-        """Load actual table data from CSV"""
+    def load_table_csv(self, doc_name: str, table_idx: int, load_data: bool = False) -> Dict:
+        """Load table shape and preview from CSV (full rows only when load_data=True)"""
         table_csv = self.tables_dir / doc_name / f"table_{table_idx + 1}.csv"
         table_data = {
             "exists": False,
             "rows": 0,
             "columns": 0,
-            "data": [],
             "preview": ""
         }
         
@@ -93,7 +155,8 @@ class EnhancedDoclingMetadataProcessor:
                 table_data["exists"] = True
                 table_data["rows"] = len(df)
                 table_data["columns"] = len(df.columns)
-                table_data["data"] = df.to_dict('records')
+                if load_data:
+                    table_data["data"] = df.to_dict('records')
                 
                 # Create preview (first 3 rows)
                 preview_rows = []
@@ -164,15 +227,9 @@ class EnhancedDoclingMetadataProcessor:
                 return "caption"
         
         # SEC-specific sections from text content
-        text_lower = text.lower() if text else ""
-        if 'risk factor' in text_lower:
-            return "risk_factors"
-        elif 'management discussion' in text_lower or 'md&a' in text_lower:
-            return "md&a"
-        elif 'financial statement' in text_lower:
-            return "financial_statements"
-        elif 'business overview' in text_lower:
-            return "business_overview"
+        code = _classify(text)
+        if code >= 0:
+            return _SECTION_KEYWORDS[code][1]
         
         # Default by type
         return {
@@ -181,7 +238,7 @@ class EnhancedDoclingMetadataProcessor:
             'text': 'body_text'
         }.get(item_type, 'unknown')
     
-    def process_document(self, doc_name: str) -> List[Dict]:
+    def process_document(self, doc_name: str) -> List[MetadataRecord]:
         """Process all outputs for a document and create metadata records"""
         print(f"\nProcessing: {doc_name}")
         
@@ -233,22 +290,21 @@ class EnhancedDoclingMetadataProcessor:
                 page = bbox.get('page', 1)
                 section = self.determine_section(text_item, 'text', text_content)
                 
-                record = {
-                    "doc_id": doc_id,
-                    "company": company_info['company'],
-                    "fiscal_year": company_info['fiscal_year'],
-                    "filing_type": company_info['filing_type'],
-                    "page": page,
-                    "section": section,
-                    "block_type": "text",
-                    "bbox": bbox,
-                    "text": text_content[:1000],
-                    "text_full_length": len(text_content),
-                    "source_path": str(json_path),
-                    "item_index": idx,
-                    "extraction_timestamp": datetime.now().isoformat(),
-                    "extraction_method": "docling"
-                }
+                record = MetadataRecord(
+                    doc_id=doc_id,
+                    company=company_info['company'],
+                    fiscal_year=company_info['fiscal_year'],
+                    filing_type=company_info['filing_type'],
+                    page=page,
+                    section=section,
+                    block_type="text",
+                    bbox=bbox,
+                    text=text_content[:1000],
+                    text_full_length=len(text_content),
+                    source_path=str(json_path),
+                    item_index=idx,
+                    extraction_timestamp=datetime.now().isoformat(),
+                )
                 records.append(record)
         
         # Process tables with actual CSV data
@@ -273,27 +329,26 @@ class EnhancedDoclingMetadataProcessor:
                         "bottom": prov['bbox'].get('b', 0)
                     }
                 
-                record = {
-                    "doc_id": doc_id,
-                    "company": company_info['company'],
-                    "fiscal_year": company_info['fiscal_year'],
-                    "filing_type": company_info['filing_type'],
-                    "page": bbox.get('page', 1),
-                    "section": "financial_table",
-                    "block_type": "table",
-                    "bbox": bbox,
-                    "text": table_data["preview"] if table_data["exists"] else f"Table {idx + 1}",
-                    "text_full_length": table_data["rows"] * table_data["columns"],
-                    "source_path": str(self.tables_dir / doc_name / f"table_{idx + 1}.csv"),
-                    "table_info": {
+                record = MetadataRecord(
+                    doc_id=doc_id,
+                    company=company_info['company'],
+                    fiscal_year=company_info['fiscal_year'],
+                    filing_type=company_info['filing_type'],
+                    page=bbox.get('page', 1),
+                    section="financial_table",
+                    block_type="table",
+                    bbox=bbox,
+                    text=table_data["preview"] if table_data["exists"] else f"Table {idx + 1}",
+                    text_full_length=table_data["rows"] * table_data["columns"],
+                    source_path=str(self.tables_dir / doc_name / f"table_{idx + 1}.csv"),
+                    table_info={
                         "rows": table_data["rows"],
                         "columns": table_data["columns"],
                         "csv_exists": table_data["exists"]
                     },
-                    "item_index": idx,
-                    "extraction_timestamp": datetime.now().isoformat(),
-                    "extraction_method": "docling"
-                }
+                    item_index=idx,
+                    extraction_timestamp=datetime.now().isoformat(),
+                )
                 records.append(record)
         
         # Process figures with file existence check
@@ -320,111 +375,124 @@ class EnhancedDoclingMetadataProcessor:
                 
                 caption = picture.get('caption', f"Figure {idx + 1}")
                 
-                record = {
-                    "doc_id": doc_id,
-                    "company": company_info['company'],
-                    "fiscal_year": company_info['fiscal_year'],
-                    "filing_type": company_info['filing_type'],
-                    "page": bbox.get('page', 1),
-                    "section": "figure",
-                    "block_type": "picture",
-                    "bbox": bbox,
-                    "text": caption,
-                    "text_full_length": len(caption),
-                    "source_path": figure_info["path"] if figure_info["exists"] else str(json_path),
-                    "figure_info": {
+                record = MetadataRecord(
+                    doc_id=doc_id,
+                    company=company_info['company'],
+                    fiscal_year=company_info['fiscal_year'],
+                    filing_type=company_info['filing_type'],
+                    page=bbox.get('page', 1),
+                    section="figure",
+                    block_type="picture",
+                    bbox=bbox,
+                    text=caption,
+                    text_full_length=len(caption),
+                    source_path=figure_info["path"] if figure_info["exists"] else str(json_path),
+                    figure_info={
                         "png_exists": figure_info["exists"],
                         "file_size": figure_info["size"]
                     },
-                    "item_index": idx,
-                    "extraction_timestamp": datetime.now().isoformat(),
-                    "extraction_method": "docling"
-                }
+                    item_index=idx,
+                    extraction_timestamp=datetime.now().isoformat(),
+                )
                 records.append(record)
         
         print(f"  ✓ Created {len(records)} metadata records")
         return records
     
-    def save_jsonl(self, records: List[Dict], doc_name: str):
+    def save_jsonl(self, records: List[MetadataRecord], doc_name: str):
         """Save records as JSONL"""
         jsonl_path = self.metadata_dir / f"{doc_name}.jsonl"
-        with open(jsonl_path, 'w', encoding='utf-8') as f:
-            for record in records:
-                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        # Serialize everything up front and hand the file a single buffer
+        if orjson is not None:
+            payload = b"".join(orjson.dumps(record.to_dict(), option=orjson.OPT_SERIALIZE_NUMPY) + b"\n"
+                               for record in records)
+        else:
+            payload = "".join(json.dumps(record.to_dict(), ensure_ascii=False) + "\n"
+                              for record in records).encode("utf-8")
+        with open(jsonl_path, 'wb') as f:
+            f.write(payload)
         print(f"  ✓ Saved to: {jsonl_path}")
     
-    def create_section_markdown(self, records: List[Dict], doc_name: str):
+    def create_section_markdown(self, records: List[MetadataRecord], doc_name: str):
         """Create section-based markdown summary"""
         if not records:
             return
         
         # Group by section
-        sections = {}
+        sections = defaultdict(list)
         for record in records:
-            section = record['section']
-            if section not in sections:
-                sections[section] = []
-            sections[section].append(record)
-        
-        # Build markdown
-        lines = [
-            f"# Document: {doc_name}",
-            f"**Company**: {records[0]['company']}",
-            f"**Fiscal Year**: {records[0]['fiscal_year']}",
-            f"**Filing Type**: {records[0]['filing_type']}",
-            f"**Total Items**: {len(records)}",
-            "",
-            "---",
-            ""
-        ]
+            sections[record.section].append(record)
         
-        for section_name, items in sections.items():
-            lines.append(f"## {section_name.replace('_', ' ').title()}")
-            lines.append(f"*Count: {len(items)}*\n")
-            
-            # Group by type
-            by_type = {}
-            for item in items:
-                block_type = item['block_type']
-                if block_type not in by_type:
-                    by_type[block_type] = []
-                by_type[block_type].append(item)
+        # Stream markdown straight into a large-buffered file
+        md_path = self.sections_dir / f"{doc_name}_sections.md"
+        with open(md_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            w = f.write
+            w(f"# Document: {doc_name}\n")
+            w(f"**Company**: {records[0].company}\n")
+            w(f"**Fiscal Year**: {records[0].fiscal_year}\n")
+            w(f"**Filing Type**: {records[0].filing_type}\n")
+            w(f"**Total Items**: {len(records)}\n")
+            w("\n---\n\n")
             
-            for block_type, type_items in by_type.items():
-                if block_type == 'text':
-                    for item in type_items[:5]:  # First 5
-                        preview = item['text'][:150] + "..." if len(item['text']) > 150 else item['text']
-                        lines.append(f"- **Page {item['page']}**: {preview}")
+            for section_name, items in sections.items():
+                w(f"## {section_name.replace('_', ' ').title()}\n")
+                w(f"*Count: {len(items)}*\n\n")
                 
-                elif block_type == 'table':
-                    for item in type_items:
-                        info = item.get('table_info', {})
-                        lines.append(f"- **Table {item['item_index'] + 1}** (Page {item['page']})")
-                        lines.append(f"  - Size: {info.get('rows', '?')} × {info.get('columns', '?')}")
-                        lines.append(f"  - CSV: {'✓' if info.get('csv_exists') else '✗'}")
+                # Group by type
+                by_type = defaultdict(list)
+                for item in items:
+                    by_type[item.block_type].append(item)
                 
-                elif block_type == 'picture':
-                    for item in type_items:
-                        info = item.get('figure_info', {})
-                        lines.append(f"- **Figure {item['item_index'] + 1}** (Page {item['page']}): {item['text']}")
-                        lines.append(f"  - PNG: {'✓' if info.get('png_exists') else '✗'}")
-            
-            lines.append("")
-        
-        # Save markdown
-        md_path = self.sections_dir / f"{doc_name}_sections.md"
-        with open(md_path, 'w', encoding='utf-8') as f:
-            f.write('\n'.join(lines))
+                for block_type, type_items in by_type.items():
+                    if block_type == 'text':
+                        for item in type_items[:5]:  # First 5
+                            preview = item.text[:150] + "..." if len(item.text) > 150 else item.text
+                            w(f"- **Page {item.page}**: {preview}\n")
+                    
+                    elif block_type == 'table':
+                        for item in type_items:
+                            info = item.table_info or {}
+                            w(f"- **Table {item.item_index + 1}** (Page {item.page})\n")
+                            w(f"  - Size: {info.get('rows', '?')} × {info.get('columns', '?')}\n")
+                            w(f"  - CSV: {'✓' if info.get('csv_exists') else '✗'}\n")
+                    
+                    elif block_type == 'picture':
+                        for item in type_items:
+                            info = item.figure_info or {}
+                            w(f"- **Figure {item.item_index + 1}** (Page {item.page}): {item.text}\n")
+                            w(f"  - PNG: {'✓' if info.get('png_exists') else '✗'}\n")
+                
+                w("\n")
         print(f"  ✓ Created summary: {md_path}")
     
-    def process_all(self):
-        """Process all documents"""
+    def is_up_to_date(self, json_path: Path) -> bool:
+        """True if both outputs for json_path exist and are newer than it"""
+        doc_name = json_path.stem
+        outputs = (
+            self.metadata_dir / f"{doc_name}.jsonl",
+            self.sections_dir / f"{doc_name}_sections.md",
+        )
+        try:
+            src_mtime = json_path.stat().st_mtime
+            return all(out.stat().st_mtime >= src_mtime for out in outputs)
+        except FileNotFoundError:
+            return False
+    
+    def process_all(self, force: bool = False):
+        """Process all documents (unchanged ones are skipped unless force=True)"""
         json_files = sorted(self.json_dir.glob("*.json"))
         
         if not json_files:
             print("No JSON files found")
             return
         
+        if not force:
+            stale = [jp for jp in json_files if not self.is_up_to_date(jp)]
+            skipped = len(json_files) - len(stale)
+            if skipped:
+                print(f"Skipping {skipped} up-to-date document(s) (use --force to rebuild)")
+            json_files = stale
+        
         print(f"Found {len(json_files)} documents to process")
         print("=" * 60)
         
@@ -445,5 +513,10 @@ class EnhancedDoclingMetadataProcessor:
         print(f"  • Section summaries: {self.sections_dir}")
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build Docling metadata and section summaries")
+    ap.add_argument("--force", action="store_true",
+                    help="Reprocess every document even if its outputs are up to date.")
+    args = ap.parse_args()
+
     processor = EnhancedDoclingMetadataProcessor()
-    processor.process_all()
\ No newline at end of file
+    processor.process_all(force=args.force)
@@ -9,17 +9,24 @@ No external image libraries needed!
          data/parsed/docling/json/<stem>.json       (full DoclingDocument)
          data/parsed/docling/tables/<stem>/         (individual table files as CSV/HTML)
          data/parsed/docling/figures/<stem>/        (extracted figure images)
-         data/parsed/docling/pages/<stem>/          (page images for visualization)
+         data/parsed/docling/pages/<stem>/          (page images for visualization, WebP by default)
          data/parsed/docling/layout/<stem>/         (layout info with bounding boxes)
          data/parsed/docling/summary.csv            (per-file summary)
 
 Dependencies:
-  pip install docling pandas tabulate
+  pip install docling            (pandas only arrives via Docling's table export)
+  optional: orjson, fpnge, opencv-python-headless (faster JSON / PNG writes)
 """
+import argparse
+import csv
+import functools
 import os
 from pathlib import Path
 import logging
+import queue
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 # Use a local cache folder inside the project
 os.environ["HF_HOME"] = str(Path(".hf_cache").resolve())
@@ -31,48 +38,45 @@ os.environ["HF_HUB_ENABLE_HARDLINKS"] = "0"
 # (Optional) silence the warning message about symlinks
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
 
-# FIXED: Monkeypatch to handle the argument that's being passed
-try:
-    import huggingface_hub.file_download as _fd
-    # These functions are being called with a path argument, so accept it but ignore it
-    _fd.are_symlinks_supported = lambda path=None: False
-    _fd.are_hardlinks_supported = lambda path=None: False
-except Exception:
-    pass
-
-# Alternative more robust monkeypatch if the above doesn't work
+# Monkeypatch the hub's link probes (they are called with a path argument; accept anything)
 try:
     import huggingface_hub
-    import huggingface_hub.file_download
-    
-    # Create wrapper functions that can handle any number of arguments
-    def no_symlinks(*args, **kwargs):
-        return False
-    
-    def no_hardlinks(*args, **kwargs):
-        return False
-    
-    # Apply the patches
-    huggingface_hub.file_download.are_symlinks_supported = no_symlinks
-    huggingface_hub.file_download.are_hardlinks_supported = no_hardlinks
-    
-    # Also patch at module level if it exists there
-    if hasattr(huggingface_hub, 'are_symlinks_supported'):
-        huggingface_hub.are_symlinks_supported = no_symlinks
-    if hasattr(huggingface_hub, 'are_hardlinks_supported'):
-        huggingface_hub.are_hardlinks_supported = no_hardlinks
-        
+    import huggingface_hub.file_download as _fd
+    _no_links = lambda *args, **kwargs: False
+    for _mod in (_fd, huggingface_hub):
+        # the top-level re-exports only exist in some hub versions
+        for _name in ("are_symlinks_supported", "are_hardlinks_supported"):
+            if _mod is _fd or hasattr(_mod, _name):
+                setattr(_mod, _name, _no_links)
 except Exception as e:
     print(f"Warning: Could not patch huggingface_hub symlink functions: {e}")
 
 import json
-import pandas as pd
-from rich import print
+from typing import Optional
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # fall back to stdlib json
+    orjson = None
+
+# Optional fast PNG encoders (PIL is the fallback)
+try:
+    import fpnge
+except ImportError:
+    fpnge = None
+
+try:
+    import cv2
+    _CV2_CONVERSIONS = {"RGB": cv2.COLOR_RGB2BGR, "RGBA": cv2.COLOR_RGBA2BGRA, "L": None}
+except ImportError:
+    cv2 = None
 
 # --- Docling core imports ---
 from docling.document_converter import DocumentConverter, PdfFormatOption
-from docling.datamodel.pipeline_options import PdfPipelineOptions
-from docling.datamodel.base_models import InputFormat
+from docling.datamodel.pipeline_options import AcceleratorDevice, AcceleratorOptions, PdfPipelineOptions
+from docling.datamodel.settings import settings as docling_settings
+from docling.datamodel.base_models import ConversionStatus, InputFormat
 from docling_core.types.doc import ImageRefMode, PictureItem, TableItem
 
 # Set up logging
@@ -88,15 +92,102 @@ OUT_FIG  = Path("data/parsed/docling/figures")
 OUT_PAGE = Path("data/parsed/docling/pages")
 OUT_LAYOUT = Path("data/parsed/docling/layout")  # NEW: Layout output directory
 OUT_SUM  = Path("data/parsed/docling/summary.csv")
+SUMMARY_FIELDS = ["file", "pages", "tables", "figures", "blocks"]
+SUMMARY_CACHE = Path("data/parsed/docling/summary_cache.json")  # per-PDF signature + summary row
 
 # Image quality settings
-IMAGE_RESOLUTION_SCALE = 2.0  # Higher = better quality (2.0 = ~144 DPI)
+IMAGE_RESOLUTION_SCALE = float(os.environ.get("DOCLING_IMAGE_SCALE", "1.0"))  # Higher = better quality (2.0 = ~144 DPI)
+GENERATE_PAGE_IMAGES = os.environ.get("DOCLING_PAGE_IMAGES", "0") == "1"       # page previews are opt-in
+PNG_COMPRESS_LEVEL = 1        # zlib level: 1 = fast, slightly larger files (PIL default is 6)
+PAGE_IMAGE_FORMAT = "webp"    # page previews: "webp", "jpg" or "png" (figures always stay PNG)
+PAGE_IMAGE_QUALITY = 85       # lossy quality for webp/jpg page previews
 
-def convert_and_extract(pdf_path: Path):
-    """
-    Run Docling on a single PDF with image extraction enabled.
-    Returns the conversion result for further processing.
-    """
+# Model inference settings: AUTO picks CUDA/MPS when present; larger page batches keep the GPU busy
+ACCELERATOR_THREADS = int(os.environ.get("DOCLING_NUM_THREADS", "4"))
+PAGE_BATCH_SIZE = int(os.environ.get("DOCLING_PAGE_BATCH_SIZE", "8"))
+# Rough resident size of one converter process (layout + table models, page images) for auto sizing
+WORKER_MEMORY_GB = float(os.environ.get("DOCLING_WORKER_MEMORY_GB", "3"))
+
+# Large write buffer for JSON/CSV outputs (fewer, bigger write syscalls)
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Per-process background image writer: extract_* enqueue (encode_fn, args) and return immediately,
+# daemon threads do the encoding (zlib releases the GIL while compressing)
+IMAGE_QUEUE_SIZE = 32
+MAX_IMAGE_WRITERS = 4         # writer threads per process, shared with the other converter processes' cores
+_IMAGE_QUEUE = None
+_WORKERS = 1                  # converter processes in this run (set by init_worker in pool mode)
+_IMAGE_QUEUE_LOCK = threading.Lock()
+
+def _image_writer(q: queue.Queue):
+    """Consume (encode_fn, args) jobs forever; args[-1] is the output path"""
+    while True:
+        encode, args = q.get()
+        try:
+            encode(*args)
+        except Exception as e:
+            _log.warning(f"Could not save image {args[-1]}: {e}")
+        finally:
+            q.task_done()
+
+def image_queue() -> queue.Queue:
+    """Return this process's image writer queue, starting its writer threads on first use"""
+    global _IMAGE_QUEUE
+    with _IMAGE_QUEUE_LOCK:
+        if _IMAGE_QUEUE is None:
+            _IMAGE_QUEUE = queue.Queue(maxsize=IMAGE_QUEUE_SIZE)
+            # the cores are already split across converter processes and their torch threads
+            n_threads = max(1, min(MAX_IMAGE_WRITERS, (os.cpu_count() or 1) // _WORKERS))
+            for i in range(n_threads):
+                threading.Thread(target=_image_writer, args=(_IMAGE_QUEUE,),
+                                 name=f"docling-img-{i}", daemon=True).start()
+    return _IMAGE_QUEUE
+
+def dumps_json(obj) -> bytes:
+    """Indented UTF-8 JSON bytes (orjson when installed, stdlib json otherwise)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+
+def save_png(pil_image, path: Path):
+    """Encode a PIL image to PNG at path with the fastest encoder available (fpnge > OpenCV > PIL)"""
+    mode = pil_image.mode
+    if fpnge is not None and mode in ("L", "LA", "RGB", "RGBA"):
+        # Hand the pixel buffer straight to the encoder (one C call, no PIL save machinery)
+        arr = np.asarray(pil_image)
+        if arr.ndim == 2:
+            arr = arr[:, :, None]
+        path.write_bytes(fpnge.fromNP(arr))
+        return
+    if cv2 is not None and mode in _CV2_CONVERSIONS:
+        arr = np.asarray(pil_image)
+        code = _CV2_CONVERSIONS[mode]
+        if code is not None:
+            arr = cv2.cvtColor(arr, code)
+        if cv2.imwrite(str(path), arr, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESS_LEVEL]):
+            return
+    with path.open("wb") as fp:
+        pil_image.save(fp, format="PNG", compress_level=PNG_COMPRESS_LEVEL, optimize=False)
+
+def save_page_image(pil_image, path: Path):
+    """Encode a page preview in PAGE_IMAGE_FORMAT (lossy formats are far cheaper than PNG)"""
+    if PAGE_IMAGE_FORMAT == "png":
+        save_png(pil_image, path)
+        return
+    with path.open("wb") as fp:
+        if PAGE_IMAGE_FORMAT == "webp":
+            pil_image.save(fp, format="WEBP", quality=PAGE_IMAGE_QUALITY, method=0)
+        else:
+            pil_image.convert("RGB").save(fp, format="JPEG", quality=PAGE_IMAGE_QUALITY)
+
+def save_figure(element, doc, path: Path):
+    """Crop a PictureItem out of its page image and encode it to PNG"""
+    save_png(element.get_image(doc), path)
+
+# Built once per process and reused for every PDF (model loading is expensive)
+@functools.lru_cache(maxsize=1)
+def get_converter() -> DocumentConverter:
+    """Return this process's DocumentConverter, building it (and printing the device) on first use"""
     # Check if GPU is available and print status
     import torch
     if torch.cuda.is_available():
@@ -107,21 +198,27 @@ def convert_and_extract(pdf_path: Path):
     # Configure pipeline to generate images
     pipeline_options = PdfPipelineOptions()
     pipeline_options.images_scale = IMAGE_RESOLUTION_SCALE
-    pipeline_options.generate_page_images = True
+    pipeline_options.generate_page_images = GENERATE_PAGE_IMAGES
     pipeline_options.generate_picture_images = True
     pipeline_options.generate_table_images = False  # Don't generate table images
+    pipeline_options.accelerator_options = AcceleratorOptions(
+        num_threads=ACCELERATOR_THREADS, device=AcceleratorDevice.AUTO
+    )
+    docling_settings.perf.page_batch_size = PAGE_BATCH_SIZE
     
     # Create converter with image extraction options
-    doc_converter = DocumentConverter(
+    return DocumentConverter(
         format_options={
             InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
         }
     )
-    
-    # Convert the document
-    conv_res = doc_converter.convert(str(pdf_path))
-    
-    return conv_res
+
+def convert_and_extract(pdf_path: Path):
+    """
+    Run Docling on a single PDF with image extraction enabled.
+    Returns the conversion result for further processing.
+    """
+    return get_converter().convert(str(pdf_path))
 
 def save_base_outputs(conv_res, stem: str):
     """Save the basic markdown and JSON outputs"""
@@ -139,14 +236,16 @@ def save_base_outputs(conv_res, stem: str):
     html_path = OUT_MD / f"{stem}.html"
     doc.save_as_html(html_path, image_mode=ImageRefMode.REFERENCED)
     
-    # Save JSON (using Docling's export)
-    try:
-        js = json.loads(doc.model_dump_json(indent=2))
-    except:
-        js = doc.model_dump() if hasattr(doc, 'model_dump') else doc.dict()
-    
+    # Save JSON (using Docling's export directly — no parse/re-serialize round trip)
     json_path = OUT_JSON / f"{stem}.json"
-    json_path.write_text(json.dumps(js, ensure_ascii=False, indent=2), encoding="utf-8")
+    try:
+        payload = doc.model_dump_json(indent=2).encode('utf-8')
+    except AttributeError:
+        # Older pydantic models: dump to Python objects and serialize once (orjson when installed)
+        dump = getattr(doc, 'model_dump', None) or doc.dict
+        payload = dumps_json(dump())
+    with open(json_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(payload)
     
     print(f"  → Saved markdown and JSON outputs")
 
@@ -155,18 +254,28 @@ def extract_page_images(conv_res, stem: str):
     page_dir = OUT_PAGE / stem
     page_dir.mkdir(parents=True, exist_ok=True)
     
+    # Hand pages to the background image writer
+    q = image_queue()
     page_count = 0
     for page_no, page in conv_res.document.pages.items():
         if hasattr(page, 'image') and page.image:
-            page_image_path = page_dir / f"page_{page.page_no}.png"
-            with page_image_path.open("wb") as fp:
-                page.image.pil_image.save(fp, format="PNG")
+            page_image_path = page_dir / f"page_{page.page_no}.{PAGE_IMAGE_FORMAT}"
+            q.put((save_page_image, (page.image.pil_image, page_image_path)))
             page_count += 1
     
     if page_count > 0:
         print(f"  → Extracted {page_count} page images to {page_dir}")
     return page_count
 
+def write_table_csv(table_df, csv_path: Path):
+    """Write a table DataFrame as CSV via csv.writer (same output as to_csv(index=False))"""
+    rows = table_df.to_numpy(dtype=object, copy=True)
+    rows[table_df.isna().to_numpy()] = ""
+    with open(csv_path, 'w', encoding='utf-8', newline='', buffering=WRITE_BUFFER_SIZE) as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow([str(c) for c in table_df.columns])
+        writer.writerows(rows.tolist())
+
 def extract_tables(conv_res, stem: str):
     """Extract tables as CSV files only"""
     table_dir = OUT_TAB / stem
@@ -182,7 +291,7 @@ def extract_tables(conv_res, stem: str):
             
             # Save as CSV only
             csv_path = table_dir / f"table_{table_idx + 1}.csv"
-            table_df.to_csv(csv_path, index=False)
+            write_table_csv(table_df, csv_path)
             
         except Exception as e:
             _log.warning(f"Could not export table {table_idx + 1}: {e}")
@@ -191,23 +300,26 @@ def extract_tables(conv_res, stem: str):
         print(f"  → Extracted {table_count} tables as CSV to {table_dir}")
     return table_count
 
-def extract_figures(conv_res, stem: str):
-    """Extract only actual figures and charts as images (no tables)"""
+def extract_figures(conv_res, stem: str, items=None):
+    """
+    Extract only actual figures and charts as images (no tables).
+    items: optional cached list(doc.iterate_items()) to avoid another tree walk.
+    """
     fig_dir = OUT_FIG / stem
     fig_dir.mkdir(parents=True, exist_ok=True)
     
     picture_count = 0
+    q = image_queue()
+    
+    if items is None:
+        items = conv_res.document.iterate_items()
     
     # Iterate through all elements to find ONLY pictures (not tables)
-    for element, _level in conv_res.document.iterate_items():
+    for element, _level in items:
         if isinstance(element, PictureItem):
             picture_count += 1
             image_path = fig_dir / f"figure_{picture_count}.png"
-            try:
-                with image_path.open("wb") as fp:
-                    element.get_image(conv_res.document).save(fp, "PNG")
-            except Exception as e:
-                _log.warning(f"Could not save figure {picture_count}: {e}")
+            q.put((save_figure, (element, conv_res.document, image_path)))
     
     if picture_count > 0:
         print(f"  → Extracted {picture_count} figures/charts to {fig_dir}")
@@ -239,140 +351,115 @@ def extract_layout_info(conv_res, stem: str):
                 "height": getattr(page, 'height', None)
             }
     
-    # Extract text items with bounding boxes
-    if hasattr(doc, 'texts'):
-        for idx, text_item in enumerate(doc.texts):
-            if hasattr(text_item, 'prov') and text_item.prov:
-                for prov in text_item.prov:
-                    if hasattr(prov, 'bbox') and prov.bbox:
-                        layout_data["text_items"].append({
-                            "index": idx,
-                            "text": text_item.text if hasattr(text_item, 'text') else None,
-                            "page_no": prov.page_no,
-                            "bbox": {
-                                "left": prov.bbox.l,
-                                "top": prov.bbox.t,
-                                "right": prov.bbox.r,
-                                "bottom": prov.bbox.b,
-                                "coord_origin": prov.bbox.coord_origin if hasattr(prov.bbox, 'coord_origin') else "BOTTOMLEFT"
-                            },
-                            "type": text_item.obj_type if hasattr(text_item, 'obj_type') else "text"
-                        })
-    
-    # Extract table bounding boxes
-    if hasattr(doc, 'tables'):
-        for idx, table in enumerate(doc.tables):
-            if hasattr(table, 'prov') and table.prov:
-                for prov in table.prov:
-                    if hasattr(prov, 'bbox') and prov.bbox:
-                        layout_data["tables"].append({
-                            "index": idx,
-                            "page_no": prov.page_no,
-                            "bbox": {
-                                "left": prov.bbox.l,
-                                "top": prov.bbox.t,
-                                "right": prov.bbox.r,
-                                "bottom": prov.bbox.b,
-                                "coord_origin": prov.bbox.coord_origin if hasattr(prov.bbox, 'coord_origin') else "BOTTOMLEFT"
-                            }
-                        })
-    
-    # Extract figure/picture bounding boxes
-    if hasattr(doc, 'pictures'):
-        for idx, picture in enumerate(doc.pictures):
-            if hasattr(picture, 'prov') and picture.prov:
-                for prov in picture.prov:
-                    if hasattr(prov, 'bbox') and prov.bbox:
-                        layout_data["figures"].append({
-                            "index": idx,
-                            "page_no": prov.page_no,
-                            "bbox": {
-                                "left": prov.bbox.l,
-                                "top": prov.bbox.t,
-                                "right": prov.bbox.r,
-                                "bottom": prov.bbox.b,
-                                "coord_origin": prov.bbox.coord_origin if hasattr(prov.bbox, 'coord_origin') else "BOTTOMLEFT"
-                            }
-                        })
+    # Single pass over texts, tables and figures: fill the JSON lists and the CSV columns together
+    types, indices, pages = [], [], []
+    lefts, tops, rights, bottoms = [], [], [], []
+    previews = []
+    sources = (
+        ("text", "text_items", getattr(doc, 'texts', None)),
+        ("table", "tables", getattr(doc, 'tables', None)),
+        ("figure", "figures", getattr(doc, 'pictures', None)),
+    )
+    for kind, key, elements in sources:
+        if not elements:
+            continue
+        out = layout_data[key]
+        is_text = kind == "text"
+        for idx, element in enumerate(elements):
+            provs = getattr(element, 'prov', None)
+            if not provs:
+                continue
+            if is_text:
+                text = getattr(element, 'text', None)
+                obj_type = getattr(element, 'obj_type', "text")
+                preview = text[:50] if text else ""
+            else:
+                preview = f"{kind.capitalize()} {idx}"
+            for prov in provs:
+                bbox = getattr(prov, 'bbox', None)
+                if not bbox:
+                    continue
+                l, t, r, b = bbox.l, bbox.t, bbox.r, bbox.b
+                page_no = prov.page_no
+                entry = {"index": idx}
+                if is_text:
+                    entry["text"] = text
+                entry["page_no"] = page_no
+                entry["bbox"] = {
+                    "left": l,
+                    "top": t,
+                    "right": r,
+                    "bottom": b,
+                    "coord_origin": getattr(bbox, 'coord_origin', "BOTTOMLEFT")
+                }
+                if is_text:
+                    entry["type"] = obj_type
+                out.append(entry)
+                
+                types.append(kind)
+                indices.append(idx)
+                pages.append(page_no)
+                lefts.append(l)
+                tops.append(t)
+                rights.append(r)
+                bottoms.append(b)
+                previews.append(preview)
     
     # Save layout data as JSON
     layout_json_path = layout_dir / "layout.json"
-    with open(layout_json_path, 'w', encoding='utf-8') as f:
-        json.dump(layout_data, f, indent=2, ensure_ascii=False)
-    
-    # Save layout data as CSV for easy analysis
-    rows = []
-    for item in layout_data["text_items"]:
-        rows.append({
-            "type": "text",
-            "index": item["index"],
-            "page": item["page_no"],
-            "left": item["bbox"]["left"],
-            "top": item["bbox"]["top"],
-            "right": item["bbox"]["right"],
-            "bottom": item["bbox"]["bottom"],
-            "width": item["bbox"]["right"] - item["bbox"]["left"],
-            "height": item["bbox"]["bottom"] - item["bbox"]["top"],
-            "text_preview": item["text"][:50] if item["text"] else ""
-        })
-    
-    for item in layout_data["tables"]:
-        rows.append({
-            "type": "table",
-            "index": item["index"],
-            "page": item["page_no"],
-            "left": item["bbox"]["left"],
-            "top": item["bbox"]["top"],
-            "right": item["bbox"]["right"],
-            "bottom": item["bbox"]["bottom"],
-            "width": item["bbox"]["right"] - item["bbox"]["left"],
-            "height": item["bbox"]["bottom"] - item["bbox"]["top"],
-            "text_preview": f"Table {item['index']}"
-        })
-    
-    for item in layout_data["figures"]:
-        rows.append({
-            "type": "figure",
-            "index": item["index"],
-            "page": item["page_no"],
-            "left": item["bbox"]["left"],
-            "top": item["bbox"]["top"],
-            "right": item["bbox"]["right"],
-            "bottom": item["bbox"]["bottom"],
-            "width": item["bbox"]["right"] - item["bbox"]["left"],
-            "height": item["bbox"]["bottom"] - item["bbox"]["top"],
-            "text_preview": f"Figure {item['index']}"
-        })
-    
-    if rows:
-        df = pd.DataFrame(rows)
+    with open(layout_json_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(dumps_json(layout_data))
+    
+    # Save layout data as CSV for easy analysis — columns were collected above
+    n_rows = len(types)
+    if n_rows:
+        left = np.asarray(lefts, dtype=np.float64)
+        top = np.asarray(tops, dtype=np.float64)
+        right = np.asarray(rights, dtype=np.float64)
+        bottom = np.asarray(bottoms, dtype=np.float64)
+        
+        # Format every column with vectorized string ops and join rows in one pass
+        # (previews are always quoted since they may hold commas, quotes or newlines)
+        quoted = np.char.add(np.char.add('"', np.char.replace(np.asarray(previews, dtype=str), '"', '""')), '"')
+        columns = [
+            np.asarray(types, dtype=str),
+            np.char.mod('%d', np.asarray(indices)),
+            np.char.mod('%d', np.asarray(pages)),
+            *(np.char.mod('%.3f', arr) for arr in (left, top, right, bottom, right - left, bottom - top)),
+            quoted,
+        ]
+        lines = columns[0]
+        for col in columns[1:]:
+            lines = np.char.add(np.char.add(lines, ","), col)
+        header = "type,index,page,left,top,right,bottom,width,height,text_preview\n"
+        
         csv_path = layout_dir / "bounding_boxes.csv"
-        df.to_csv(csv_path, index=False)
+        with open(csv_path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write((header + "\n".join(lines.tolist()) + "\n").encode("utf-8"))
         
-        print(f"  → Extracted layout info: {len(rows)} items with bounding boxes")
+        print(f"  → Extracted layout info: {n_rows} items with bounding boxes")
         print(f"    - JSON: {layout_json_path}")
         print(f"    - CSV: {csv_path}")
     else:
         print(f"  → No layout information found")
     
-    return len(rows)
+    return n_rows
 
-def create_summary(conv_res):
-    """Create summary statistics for the document"""
+def create_summary(conv_res, items=None):
+    """Create summary statistics for the document (items: cached iterate_items() list)"""
     doc = conv_res.document
+    if items is None:
+        items = list(doc.iterate_items()) if hasattr(doc, 'iterate_items') else []
     
     # Count different elements
     pages = len(doc.pages) if hasattr(doc, 'pages') else 0
     tables = len(doc.tables) if hasattr(doc, 'tables') else 0
     
     # Count pictures
-    pictures = 0
-    for element, _ in doc.iterate_items():
-        if isinstance(element, PictureItem):
-            pictures += 1
+    pictures = sum(1 for element, _ in items if isinstance(element, PictureItem))
     
     # Count text blocks
-    blocks = len(list(doc.iterate_items())) if hasattr(doc, 'iterate_items') else 0
+    blocks = len(items)
     
     return {
         "pages": pages,
@@ -381,55 +468,231 @@ def create_summary(conv_res):
         "blocks": blocks
     }
 
+def write_outputs(pdf: Path, conv_res, start_time: float) -> dict:
+    """Write every output for an already-converted PDF and return its summary row"""
+    stem = pdf.stem
+    
+    # Walk the document tree once; figures and summary share the result
+    items = list(conv_res.document.iterate_items())
+    
+    # 2-6) Write outputs concurrently: base outputs (MD, JSON, HTML), page images,
+    #      tables (CSV only), figures and charts, layout info with bounding boxes
+    with ThreadPoolExecutor(max_workers=5, thread_name_prefix="docling-io") as ex:
+        futures = [
+            ex.submit(save_base_outputs, conv_res, stem),
+            ex.submit(extract_page_images, conv_res, stem) if GENERATE_PAGE_IMAGES else None,
+            ex.submit(extract_tables, conv_res, stem),
+            ex.submit(extract_figures, conv_res, stem, items=items),
+            ex.submit(extract_layout_info, conv_res, stem),
+        ]
+        for fut in futures:
+            if fut is not None:
+                fut.result()
+    
+    # 7) Create summary
+    summary = create_summary(conv_res, items=items)
+    summary["file"] = pdf.name
+    
+    # Wait for queued page/figure images before reporting the PDF as done
+    if _IMAGE_QUEUE is not None:
+        _IMAGE_QUEUE.join()
+    
+    elapsed = time.time() - start_time
+    print(f"  → {pdf.name} completed in {elapsed:.1f} seconds\n")
+    return summary
+
+def init_worker(workers: int):
+    """Pool initializer: note how many converter processes share the machine, then load the models"""
+    global _WORKERS
+    _WORKERS = workers
+    get_converter()
+
+def process_one(pdf: Path) -> dict:
+    """Convert a single PDF and write all of its outputs; returns the summary row"""
+    start_time = time.time()
+    # 1) Convert with image extraction enabled
+    conv_res = convert_and_extract(pdf)
+    return write_outputs(pdf, conv_res, start_time)
+
+def iter_batch(pdfs: list):
+    """Convert a batch of PDFs with Docling's convert_all, yielding (pdf, summary row) as each finishes.
+    PDFs that fail to convert or to write are logged and skipped; the rest of the batch goes on."""
+    # convert_all converts lazily as results are consumed, reusing model state across the batch;
+    # raises_on_error=False turns a corrupt PDF into a FAILURE result instead of ending the batch
+    results = get_converter().convert_all([str(p) for p in pdfs], raises_on_error=False)
+    start_time = time.time()
+    for pdf, conv_res in zip(pdfs, results):
+        if conv_res.status not in (ConversionStatus.SUCCESS, ConversionStatus.PARTIAL_SUCCESS):
+            errors = "; ".join(e.error_message for e in conv_res.errors) or conv_res.status
+            _log.error(f"✗ {pdf.name}: conversion failed ({errors}), skipped")
+        else:
+            if conv_res.status == ConversionStatus.PARTIAL_SUCCESS:
+                _log.warning(f"{pdf.name}: partially converted, writing what Docling produced")
+            try:
+                row = write_outputs(pdf, conv_res, start_time)
+            except Exception as e:
+                _log.error(f"✗ {pdf.name}: could not write outputs ({e}), skipped")
+            else:
+                yield pdf, row
+        start_time = time.time()
+
+def process_batch(pdfs: list) -> list:
+    """
+    Convert a batch of PDFs and write their outputs.
+    Top-level (picklable) so it can run inside a process pool; returns (pdf, summary row) pairs in
+    input order for the PDFs that succeeded.
+    """
+    return list(iter_batch(pdfs))
+
+def pdf_signature(pdf: Path) -> list:
+    """Cheap change detector for a PDF: [mtime_ns, size]"""
+    st = pdf.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+def load_summary_cache() -> dict:
+    """Load {stem: {"sig": [...], "summary": {...}}} from SUMMARY_CACHE (empty if missing/corrupt)"""
+    try:
+        raw = SUMMARY_CACHE.read_bytes()
+        return orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_summary_cache(cache: dict):
+    """Write SUMMARY_CACHE atomically (temp file + os.replace), so a crash never leaves it half-written"""
+    tmp = SUMMARY_CACHE.with_name(SUMMARY_CACHE.name + ".tmp")
+    tmp.write_bytes(dumps_json(cache))
+    os.replace(tmp, SUMMARY_CACHE)
+
+def cached_summary(pdf: Path, cache: dict) -> Optional[dict]:
+    """Return the cached summary row if pdf is unchanged and its JSON output is newer than it"""
+    entry = cache.get(pdf.stem)
+    if not entry or entry.get("sig") != pdf_signature(pdf):
+        return None
+    out_json = OUT_JSON / f"{pdf.stem}.json"
+    if not out_json.exists() or out_json.stat().st_mtime_ns < pdf.stat().st_mtime_ns:
+        return None
+    return entry.get("summary")
+
+def list_pdfs(root: Path) -> list:
+    """All PDFs under root, sorted (iterative os.scandir walk, no per-entry Path objects)"""
+    stack, found = [root], []
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(".pdf"):
+                    found.append(entry.path)
+    return sorted(map(Path, found))
+
+def available_memory() -> Optional[int]:
+    """Bytes of memory available to new processes (psutil when installed, else sysconf; None if unknown)"""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):  # no sysconf (Windows) or name unsupported (macOS)
+        return None
+
+def pick_worker_count(n_pdfs: int) -> int:
+    """
+    Converter processes for n_pdfs on this machine; a single worker when a GPU is in use.
+    On CPU each process loads its own models and runs ACCELERATOR_THREADS torch threads, so the
+    cores are divided by that, and the count is bounded by memory for WORKER_MEMORY_GB each.
+    """
+    import torch
+    if torch.cuda.is_available():
+        # Several processes sharing one GPU would oversubscribe VRAM
+        return 1
+    workers = (os.cpu_count() or 1) // max(1, ACCELERATOR_THREADS)
+    avail = available_memory()
+    if avail is not None:
+        workers = min(workers, int(avail // (WORKER_MEMORY_GB * (1 << 30))))
+    return max(1, min(n_pdfs, workers))
+
 if __name__ == "__main__":
+    from rich import print
+
+    ap = argparse.ArgumentParser(description="Docling unified PDF parsing")
+    ap.add_argument("--force", action="store_true",
+                    help="Reprocess every PDF even if its outputs are up to date.")
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("DOCLING_WORKERS", "0")),
+                    help="Converter processes (default: $DOCLING_WORKERS, or 0 = auto; 1 = sequential).")
+    args = ap.parse_args()
+
     # Create output folders (including new layout folder)
     for dir_path in [OUT_MD, OUT_JSON, OUT_TAB, OUT_FIG, OUT_PAGE, OUT_LAYOUT]:
         dir_path.mkdir(parents=True, exist_ok=True)
 
-    pdfs = sorted(IN_DIR.rglob("*.pdf"))
+    pdfs = list_pdfs(IN_DIR)
     if not pdfs:
         print("[yellow]No PDFs found in data/upload/ — add files and rerun.[/]")
         raise SystemExit
 
-    print(f"[cyan]Docling (Native Features) — processing {len(pdfs)} PDF(s)[/]")
-    print(f"[cyan]Image quality scale: {IMAGE_RESOLUTION_SCALE}x (higher = better quality)[/]\n")
-    
-    rows = []
-    for i, pdf in enumerate(pdfs, start=1):
-        stem = pdf.stem
-        print(f"[bold][{i}/{len(pdfs)}] Processing: {pdf.name}[/bold]")
-        
-        start_time = time.time()
-        
-        # 1) Convert with image extraction enabled
-        conv_res = convert_and_extract(pdf)
-        
-        # 2) Save base outputs (MD, JSON, HTML)
-        save_base_outputs(conv_res, stem)
-        
-        # 3) Extract page images
-        extract_page_images(conv_res, stem)
-        
-        # 4) Extract tables (CSV only)
-        extract_tables(conv_res, stem)
-        
-        # 5) Extract figures and charts
-        extract_figures(conv_res, stem)
-        
-        # 6) Extract layout information with bounding boxes (NEW)
-        extract_layout_info(conv_res, stem)
+    # Reuse summaries of PDFs that have not changed since their last successful run
+    cache = {} if args.force else load_summary_cache()
+    summaries = {}
+    for pdf in pdfs:
+        cached = cached_summary(pdf, cache)
+        if cached is not None:
+            summaries[pdf] = cached
+    todo = [pdf for pdf in pdfs if pdf not in summaries]
+    if summaries:
+        print(f"[dim]Skipping {len(summaries)} unchanged PDF(s) (use --force to rebuild)[/]")
+
+    if args.workers > 0:
+        # Explicit count (e.g. several GPU workers when VRAM allows), never more than PDFs to do
+        workers = max(1, min(args.workers, len(todo)))
+    else:
+        workers = pick_worker_count(len(todo))
+    print(f"[cyan]Docling (Native Features) — processing {len(todo)} PDF(s) with {workers} worker(s)[/]")
+    print(f"[cyan]Image quality scale: {IMAGE_RESOLUTION_SCALE}x (higher = better quality), "
+          f"page images: {'on' if GENERATE_PAGE_IMAGES else 'off (set DOCLING_PAGE_IMAGES=1)'}[/]\n")
+    
+    # 8) Summary CSV is written as rows arrive (cached rows first) and flushed after each PDF
+    with open(OUT_SUM, 'w', encoding='utf-8', newline='', buffering=1 << 16) as sum_f:
+        writer = csv.DictWriter(sum_f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(summaries[pdf] for pdf in pdfs if pdf in summaries)
+        sum_f.flush()
         
-        # 7) Create summary
-        summary = create_summary(conv_res)
-        summary["file"] = pdf.name
-        rows.append(summary)
+        def record(pdf, row):
+            summaries[pdf] = row
+            writer.writerow(row)
+            sum_f.flush()
+            # Record the signature as soon as this PDF's outputs are written, so a later failure
+            # or interrupt does not cost the PDFs already converted in this run
+            cache[pdf.stem] = {"sig": pdf_signature(pdf), "summary": row}
+            save_summary_cache(cache)
         
-        elapsed = time.time() - start_time
-        print(f"  → Completed in {elapsed:.1f} seconds\n")
-    
-    # 8) Write summary CSV
-    df = pd.DataFrame(rows)
-    df.to_csv(OUT_SUM, index=False)
+        if todo and workers == 1:
+            for pdf, row in iter_batch(todo):
+                record(pdf, row)
+        elif todo:
+            # One task per PDF: idle workers pick up the next PDF (no fixed slices), and each row
+            # is recorded (summary flushed, cache saved) the moment its PDF is done
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(workers,)) as ex:
+                futures = {ex.submit(process_batch, [pdf]): pdf for pdf in todo}
+                for fut in as_completed(futures):
+                    pdf = futures[fut]
+                    try:
+                        results = fut.result()
+                    except Exception as e:
+                        # e.g. BrokenProcessPool after a worker was OOM-killed: every PDF still in
+                        # flight fails here; none is cached, so the next run retries them
+                        _log.error(f"✗ {pdf.name}: worker failed ({e!r}), skipped")
+                        continue
+                    for done, row in results:
+                        record(done, row)
+                    print(f"[bold][{len(summaries)}/{len(pdfs)}] Finished: {pdf.name}[/bold]")
     
     print(f"[bold green]✓ Processing Complete![/]")
     print(f"[green]Output locations:[/]")
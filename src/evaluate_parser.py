@@ -21,9 +21,17 @@ Override any path via CLI flags. Example:
 """
 
 from __future__ import annotations
-import argparse, json, re, csv, sys
+import argparse, hashlib, json, marshal, os, re, csv, sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # NumPy row-vectorized fallback
+    numba = None
+
 # -------- Default Paths -------------------------------------------------------
 GT_TEXT_DIR_DEFAULT   = Path("data/WER/ground_truth/text")
 PRED_TEXT_DIR_DEFAULT = Path("data/WER/parsed/text")
@@ -32,6 +40,7 @@ PRED_TABLE_DEFAULT    = Path("data/WER/parsed/tables/repurchase_activity.csv")
 
 METRICS_JSON_DEFAULT  = Path("data/WER/metrics/latest.json")
 PLOTS_DIR_DEFAULT     = Path("data/WER/metrics/drift")
+NORM_CACHE_DIR        = Path("data/WER/cache")   # normalized text keyed by blake2b of normalizer + raw bytes
 
 # -------- Thresholds (used only if --assert-thresholds) ----------------------
 TEXT_WER_MAX_DEFAULT = 0.10   # <= 10% word error
@@ -45,39 +54,136 @@ def normalize_text(s: str) -> str:
     s = re.sub(r"\s+", " ", s).strip()
     return s
 
+# Fingerprint of normalize_text's compiled code: editing the normalizer invalidates the cache
+_NORM_VERSION = hashlib.blake2b(marshal.dumps(normalize_text.__code__), digest_size=8).digest()
+
 def load_text(p: Path) -> str:
     return p.read_text(encoding="utf-8", errors="ignore")
 
+def _normed(p: Path) -> str:
+    """normalize_text(load_text(p)), cached on disk by content hash so unchanged files are free."""
+    raw = p.read_bytes()
+    key = hashlib.blake2b(_NORM_VERSION + raw, digest_size=16).hexdigest()
+    cp = NORM_CACHE_DIR / f"{key}.norm"
+    if cp.exists():
+        return cp.read_text(encoding="utf-8")
+    s = normalize_text(raw.decode("utf-8", errors="ignore"))
+    cp.parent.mkdir(parents=True, exist_ok=True)
+    # eval_text workers may race on the same key: publish complete files only
+    tmp = cp.with_name(f"{cp.name}.{os.getpid()}.tmp")
+    tmp.write_text(s, encoding="utf-8")
+    os.replace(tmp, cp)
+    return s
+
+def _levenshtein_np(a: np.ndarray, b: np.ndarray) -> int:
+    """Edit distance with one vectorized DP row per element of a (NumPy fallback)"""
+    if len(a) > len(b):
+        a, b = b, a
+    H = len(b)
+    offs = np.arange(H + 1, dtype=np.int32)
+    prev = offs
+    curr = np.empty(H + 1, dtype=np.int32)
+    for i in range(1, len(a) + 1):
+        # deletions/substitutions first, then insertions via a running min along the row
+        curr[0] = i
+        np.minimum(prev[1:] + 1, prev[:-1] + (b != a[i-1]), out=curr[1:])
+        prev = np.minimum.accumulate(curr - offs) + offs
+    return int(prev[H])
+
+def _levenshtein_loop(a, b):
+    """Edit distance over two rolling int32 rows (compiled with numba when available)"""
+    if a.shape[0] > b.shape[0]:
+        a, b = b, a
+    H = b.shape[0]
+    prev = np.arange(H + 1, dtype=np.int32)
+    curr = np.empty(H + 1, dtype=np.int32)
+    for i in range(1, a.shape[0] + 1):
+        curr[0] = i
+        ai = a[i-1]
+        for j in range(1, H + 1):
+            cost = 0 if ai == b[j-1] else 1
+            curr[j] = min(prev[j]+1, curr[j-1]+1, prev[j-1]+cost)
+        prev, curr = curr, prev
+    return prev[H]
+
+if numba is not None:
+    _levenshtein = numba.njit(cache=True)(_levenshtein_loop)
+    _levenshtein(np.zeros(1, np.int32), np.zeros(1, np.int32))  # warm the JIT once
+else:
+    _levenshtein = _levenshtein_np
+
+def _token_ids(r: list[str], h: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Intern the words of both sides into shared int32 ids"""
+    ids: dict[str, int] = {}
+    to_id = lambda toks: np.fromiter((ids.setdefault(t, len(ids)) for t in toks), np.int32, len(toks))
+    return to_id(r), to_id(h)
+
 def wer(ref: str, hyp: str) -> float:
     r, h = ref.split(), hyp.split()
-    R, H = len(r), len(h)
-    dp = [[0]*(H+1) for _ in range(R+1)]
-    for i in range(R+1): dp[i][0] = i
-    for j in range(H+1): dp[0][j] = j
-    for i in range(1, R+1):
-        ri = r[i-1]
-        for j in range(1, H+1):
-            cost = 0 if ri == h[j-1] else 1
-            dp[i][j] = min(dp[i-1][j]+1, dp[i][j-1]+1, dp[i-1][j-1]+cost)
-    return dp[R][H] / max(1, R)
+    return int(_levenshtein(*_token_ids(r, h))) / max(1, len(r))
+
+def _myers_distance(ref: str, hyp: str) -> int:
+    """
+    Myers/Hyyrö bit-parallel edit distance. Python ints act as one len(ref)-bit word,
+    so each hyp character costs a handful of big-int ops instead of a DP row.
+    """
+    m = len(ref)
+    if m == 0:
+        return len(hyp)
+    peq: dict[str, int] = {}
+    for i, c in enumerate(ref):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for c in hyp:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = (ph << 1) | 1
+        mh <<= 1
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv & mask
+    return score
 
 def cer(ref: str, hyp: str) -> float:
-    R, H = len(ref), len(hyp)
-    dp = [[0]*(H+1) for _ in range(R+1)]
-    for i in range(R+1): dp[i][0] = i
-    for j in range(H+1): dp[0][j] = j
-    for i in range(1, R+1):
-        rc = ref[i-1]
-        for j in range(1, H+1):
-            cost = 0 if rc == hyp[j-1] else 1
-            dp[i][j] = min(dp[i-1][j]+1, dp[i][j-1]+1, dp[i-1][j-1]+cost)
-    return dp[R][H] / max(1, R)
+    return _myers_distance(ref, hyp) / max(1, len(ref))
+
+# Tokens are \w+ runs or single non-space chars; a token is numeric iff it is all digits
+# (sign, decimal point and % always split into their own tokens). Group 1 captures only
+# numeric tokens, so one findall yields both counts.
+_TOKEN_RE = re.compile(r"(\d+(?!\w))|\w+|\S")
 
 def numeric_token_ratio(text: str) -> float:
-    toks = re.findall(r"\w+|\S", text)
+    toks = _TOKEN_RE.findall(text)
     if not toks: return 0.0
-    nums = sum(bool(re.fullmatch(r"[+-]?\d+(\.\d+)?%?", t)) for t in toks)
-    return nums / len(toks)
+    return (len(toks) - toks.count("")) / len(toks)
+
+# Same tokens as _TOKEN_RE plus paragraph breaks (\n{2,}); group 1 is "\n" for a break,
+# the digits for a numeric token and "" otherwise
+_CHUNK_TOKEN_RE = re.compile(r"(\n(?=\n)|\d+(?!\w))(?:(?<=\n)\n*)?|\w+|\S")
+_CHUNK_SPLIT_RE = re.compile(r"\n{2,}")
+
+def chunk_stats(text: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Stripped length and numeric token ratio of every non-empty paragraph chunk, from one
+    split plus one token scan over the whole text (no per-chunk regex calls).
+    """
+    parts = _CHUNK_SPLIT_RE.split(text)
+    lens = np.fromiter(map(len, map(str.strip, parts)), np.int64, len(parts))
+    toks = np.array(_CHUNK_TOKEN_RE.findall(text), dtype=object)
+    is_break = toks == "\n"
+    chunk_id = np.cumsum(is_break)
+    n_tok = np.bincount(chunk_id[~is_break], minlength=len(parts))
+    n_num = np.bincount(chunk_id[~is_break & (toks != "")], minlength=len(parts))
+    keep = lens > 0   # a chunk is non-empty exactly when it has tokens
+    return lens[keep], n_num[keep] / n_tok[keep]
 
 def norm_cell(x: str) -> str:
     x = (x or "").strip().lower()
@@ -89,25 +195,36 @@ def read_csv_matrix(path: Path) -> list[list[str]]:
     with path.open(newline="", encoding="utf-8") as f:
         return [[norm_cell(c) for c in row] for row in csv.reader(f)]
 
+def _pad_matrix(mat: list[list[str]], rows: int, cols: int) -> np.ndarray:
+    """Copy a ragged matrix into a (rows, cols) object array, padding/truncating with ""."""
+    out = np.full((rows, cols), "", dtype=object)
+    for i, row in enumerate(mat[:rows]):
+        n = min(len(row), cols)
+        out[i, :n] = row[:n]
+    return out
+
 def cell_prf1(gt: list[list[str]], pred: list[list[str]]):
     rows = max(len(gt), len(pred))
     cols = max(len(gt[0]) if gt else 0, len(pred[0]) if pred else 0)
-    tp = fp = fn = 0
-    for i in range(rows):
-        for j in range(cols):
-            g = gt[i][j]   if i < len(gt)   and j < len(gt[i])   else ""
-            p = pred[i][j] if i < len(pred) and j < len(pred[i]) else ""
-            if p == "":
-                if g != "": fn += 1
-            else:
-                if g == p: tp += 1
-                else: fp += 1
+    G, P = _pad_matrix(gt, rows, cols), _pad_matrix(pred, rows, cols)
+    has_pred = P != ""
+    same = G == P
+    tp = int((has_pred & same).sum())
+    fp = int((has_pred & ~same).sum())
+    fn = int((~has_pred & (G != "")).sum())
     prec = tp/(tp+fp) if (tp+fp) else 0.0
     rec  = tp/(tp+fn) if (tp+fn) else 0.0
     f1   = (2*prec*rec)/(prec+rec) if (prec+rec) else 0.0
     return prec, rec, f1, {"tp": tp, "fp": fp, "fn": fn}
 
 # -------- Evaluations --------------------------------------------------------
+def _score_pair(pair: tuple[str, Path, Path]) -> tuple[str, float, float]:
+    """Worker: read + normalize one GT/prediction pair and return (name, wer, cer)"""
+    name, gt, cand = pair
+    ref = _normed(gt)
+    hyp = _normed(cand)
+    return name, wer(ref, hyp), cer(ref, hyp)
+
 def eval_text(gt_dir: Path, pred_dir: Path) -> dict:
     if not gt_dir.exists(): raise FileNotFoundError(f"Missing GT text dir: {gt_dir}")
     if not pred_dir.exists(): raise FileNotFoundError(f"Missing predicted text dir: {pred_dir}")
@@ -121,17 +238,18 @@ def eval_text(gt_dir: Path, pred_dir: Path) -> dict:
         if not cand.exists():
             print(f"[warn] skipping {gt.name}: no prediction in {pred_dir}")
             continue
-        ref = normalize_text(load_text(gt))
-        hyp = normalize_text(load_text(cand))
-        pairs.append((gt.name, ref, hyp))
+        pairs.append((gt.name, gt, cand))
 
     if not pairs:
         raise RuntimeError("No GT/prediction text pairs found")
 
+    # Pairs are independent; only paths cross the process boundary
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(pairs))) as ex:
+        results = list(ex.map(_score_pair, pairs, chunksize=4))
+
     total_w = total_c = 0.0
     details = {}
-    for name, ref, hyp in pairs:
-        w = wer(ref, hyp); c = cer(ref, hyp)
+    for name, w, c in results:
         total_w += w; total_c += c
         details[name] = {"wer": w, "cer": c}
 
@@ -154,14 +272,12 @@ def make_drift_plots(parsed_text_dir: Path, plots_dir: Path) -> dict:
     parsed_text_dir.mkdir(parents=True, exist_ok=True)
     plots_dir.mkdir(parents=True, exist_ok=True)
 
-    chunks, ratios = [], []
+    lens, rats = [], []
     for p in sorted(list(parsed_text_dir.glob("*.txt")) + list(parsed_text_dir.glob("*.md"))):
-        s = p.read_text(encoding="utf-8", errors="ignore")
-        for ch in re.split(r"\n{2,}", s):
-            ch = ch.strip()
-            if not ch: continue
-            chunks.append(len(ch))
-            ratios.append(numeric_token_ratio(ch))
+        l, r = chunk_stats(p.read_text(encoding="utf-8", errors="ignore"))
+        lens.append(l); rats.append(r)
+    chunks = np.concatenate(lens) if lens else np.empty(0, np.int64)
+    ratios = np.concatenate(rats) if rats else np.empty(0, np.float64)
 
     # Plot 1
     plt.figure()
@@ -178,8 +294,8 @@ def make_drift_plots(parsed_text_dir: Path, plots_dir: Path) -> dict:
     return {
         "drift_summary": {
             "chunks_count": len(chunks),
-            "chunk_len_mean": (sum(chunks)/len(chunks)) if chunks else 0,
-            "num_ratio_mean": (sum(ratios)/len(ratios)) if ratios else 0,
+            "chunk_len_mean": (int(chunks.sum())/len(chunks)) if len(chunks) else 0,
+            "num_ratio_mean": (sum(ratios.tolist())/len(ratios)) if len(ratios) else 0,
         }
     }
 
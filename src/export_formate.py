@@ -1,7 +1,32 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+import csv
+import fnmatch
+import io
 import json
+import os
+import numpy as np
 import pandas as pd
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # fall back to stdlib json (also accepts bytes)
+    orjson = None
+    _loads = json.loads
+
+def _dumps_indented(obj) -> bytes:
+    """Indented UTF-8 JSON bytes (orjson when installed, stdlib json otherwise)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+try:
+    import numba
+except ImportError:  # NumPy per-block slices in block_word_indices
+    numba = None
+
 PARSED_ROOT = Path("data/parsed")
 STAGED_ROOT = Path("data/staged")
 OUT_ROOT = Path("data/formats")
@@ -14,283 +39,413 @@ def _norm_path(pstr: str) -> Path:
     """Convert Windows-style 'a\\b\\c.csv' into POSIX-ish Path and return Path."""
     return Path(str(pstr).replace("\\", "/"))
 
+@lru_cache(maxsize=None)
+def _list_tables_dir(doc_id: str) -> tuple[str, ...]:
+    """Sorted CSV file names in a doc's tables dir, scanned once per run."""
+    tdir = PARSED_ROOT / doc_id / "tables"
+    try:
+        with os.scandir(tdir) as it:
+            return tuple(sorted(e.name for e in it
+                                if e.name.endswith(".csv") and not e.name.startswith(".")))
+    except (FileNotFoundError, NotADirectoryError):
+        return ()
+
+@lru_cache(maxsize=None)
+def _path_exists(path_str: str) -> bool:
+    return os.path.exists(path_str)
+
 def _fallback_table_csv(doc_id: str, page: int) -> Path | None:
     """
     If provenance points to a missing CSV, try to find a table CSV for this page.
     Looks for patterns like: table_p{page}_*.csv or general CSVs if page-less.
     """
-    tdir = PARSED_ROOT / doc_id / "tables"
-    if not tdir.exists():
+    names = _list_tables_dir(doc_id)
+    if not names:
         return None
+    tdir = PARSED_ROOT / doc_id / "tables"
     # 1) Try explicit per-page pattern
-    candidates = sorted(tdir.glob(f"table_p{page}_*.csv"))
+    candidates = fnmatch.filter(names, f"table_p{page}_*.csv")
     if candidates:
-        return candidates[0]
+        return tdir / candidates[0]
     # 2) Try camelot outputs without page in filename (lattice/stream)
-    candidates = sorted(tdir.glob("table_lattice_*.csv")) + sorted(tdir.glob("table_stream_*.csv"))
+    candidates = fnmatch.filter(names, "table_lattice_*.csv") + fnmatch.filter(names, "table_stream_*.csv")
     if candidates:
-        return candidates[0]
+        return tdir / candidates[0]
     # 3) Last resort: any CSV in tables dir
-    candidates = sorted(tdir.glob("*.csv"))
-    return candidates[0] if candidates else None
+    return tdir / names[0]
 
 # -------- helpers --------
 def load_words_by_page(doc_id: str):
+    """
+    Return {page: SoA} where each page holds parallel arrays "word" (object, stripped once here),
+    "has_text" (bool), "x0", "y0", "x1", "y1", "cx", "cy" (float64), sorted top-to-bottom,
+    left-to-right.
+    """
     words_jl = PARSED_ROOT / doc_id / f"{doc_id}_words.jsonl"
     pages = {}
     if not words_jl.exists():
         return pages
-    with open(words_jl, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                rec = json.loads(line)
-            except Exception:
-                continue
-            p = int(rec.get("page", -1))
-            if p < 0: 
-                continue
-            pages.setdefault(p, []).append(rec)
-    # sort each page roughly top-to-bottom, left-to-right
+    # one bulk read + split instead of line-by-line iteration, then bucket by page
+    for line in words_jl.read_bytes().split(b"\n"):
+        if not line:
+            continue
+        try:
+            rec = _loads(line)
+        except Exception:
+            continue
+        p = int(rec.get("page", -1))
+        if p < 0: 
+            continue
+        bucket = pages.get(p)
+        if bucket is None:
+            bucket = pages[p] = []
+        bucket.append(rec)
+    # sort each page roughly top-to-bottom, left-to-right, then transpose into columns once
     for p, arr in pages.items():
         arr.sort(key=lambda r: (r.get("bbox_norm", {}).get("y0", 0.0), r.get("bbox_norm", {}).get("x0", 0.0)))
+        n = len(arr)
+        bbs = [w.get("bbox_norm") or {} for w in arr]
+        col = lambda k: np.fromiter((bb.get(k,0) for bb in bbs), np.float64, n)
+        x0, y0, x1, y1 = col("x0"), col("y0"), col("x1"), col("y1")
+        word = np.empty(n, dtype=object)
+        word[:] = [(w.get("word") or "").strip() for w in arr]
+        pages[p] = {"word": word, "has_text": word != "", "x0": x0, "y0": y0, "x1": x1, "y1": y1,
+                    "cx": (x0 + x1) / 2, "cy": (y0 + y1) / 2}
     return pages
 
+def _box(bbox) -> list[float]:
+    return [bbox.get("x0",0), bbox.get("y0",0), bbox.get("x1",1), bbox.get("y1",1)]
+
+def block_word_indices(words_page, boxes: np.ndarray) -> list[np.ndarray]:
+    """
+    For each [x0, y0, x1, y1] row of boxes, the indices of the page's non-empty words whose
+    bbox center falls inside it, in reading order. Words are sorted by y0, so a binary search
+    first narrows each box to the slice that can possibly match, then only that slice is tested.
+    """
+    cx, cy, has_text = words_page["cx"], words_page["cy"], words_page["has_text"]
+    y0 = words_page["y0"]
+    if not len(y0):
+        return [y0.astype(np.intp)] * len(boxes)
+    # cy = y0 + half-height, so cy in [by0, by1] implies y0 in [by0 - max_half, by1 - min_half]
+    # (a small margin keeps rounding from pruning a boundary word; the exact test follows)
+    half = cy - y0
+    lo = np.searchsorted(y0, boxes[:, 1] - half.max() - 1e-9, side="left")
+    hi = np.searchsorted(y0, boxes[:, 3] - half.min() + 1e-9, side="right")
+    if numba is not None and len(boxes):
+        flat, offs = _points_in_boxes(cx, cy, has_text, boxes, lo, hi)
+        return np.split(flat, offs[1:-1])
+    out = []
+    for (bx0, by0, bx1, by1), a, b in zip(boxes.tolist(), lo.tolist(), hi.tolist()):
+        scx, scy = cx[a:b], cy[a:b]
+        m = (scx >= bx0) & (scx <= bx1) & (scy >= by0) & (scy <= by1) & has_text[a:b]
+        out.append(np.flatnonzero(m) + a)
+    return out
+
+def _points_in_boxes_loop(cx, cy, has_text, boxes, lo, hi):
+    """
+    Same test as block_word_indices over each box's [lo, hi) slice, as one flat index array plus
+    CSR offsets: a count pass sizes the output, a fill pass writes it (boxes run in parallel).
+    """
+    B = boxes.shape[0]
+    offs = np.zeros(B + 1, np.int64)
+    for k in _prange(B):
+        bx0, by0, bx1, by1 = boxes[k, 0], boxes[k, 1], boxes[k, 2], boxes[k, 3]
+        n = 0
+        for i in range(lo[k], hi[k]):
+            if has_text[i] and bx0 <= cx[i] <= bx1 and by0 <= cy[i] <= by1:
+                n += 1
+        offs[k + 1] = n
+    offs = np.cumsum(offs)
+    flat = np.empty(offs[B], np.intp)
+    for k in _prange(B):
+        bx0, by0, bx1, by1 = boxes[k, 0], boxes[k, 1], boxes[k, 2], boxes[k, 3]
+        j = offs[k]
+        for i in range(lo[k], hi[k]):
+            if has_text[i] and bx0 <= cx[i] <= bx1 and by0 <= cy[i] <= by1:
+                flat[j] = i
+                j += 1
+    return flat, offs
+
+if numba is not None:
+    _prange = numba.prange
+    _points_in_boxes = numba.njit(cache=True, parallel=True)(_points_in_boxes_loop)
+
 def words_in_block(words_page, bbox):
-    """Return words whose bbox center falls inside block bbox_norm."""
+    """Return the non-empty words whose bbox center falls inside block bbox_norm (words_page: a load_words_by_page entry)."""
     if not words_page or not bbox:
         return []
-    x0,y0,x1,y1 = bbox.get("x0",0), bbox.get("y0",0), bbox.get("x1",1), bbox.get("y1",1)
-    out = []
-    for w in words_page:
-        bb = w.get("bbox_norm") or {}
-        cx = (bb.get("x0",0)+bb.get("x1",0))/2
-        cy = (bb.get("y0",0)+bb.get("y1",0))/2
-        if x0 <= cx <= x1 and y0 <= cy <= y1:
-            out.append(w)
-    # already mostly sorted by y0,x0; keep that order
-    return out
+    idx = block_word_indices(words_page, np.array([_box(bbox)], dtype=np.float64))[0]
+    # already mostly sorted by y0,x0; index order keeps that order
+    return words_page["word"][idx].tolist()
 
 def words_to_text(words):
     # simple join with spaces; collapse multiple spaces later in renderers if needed
-    return " ".join((w.get("word") or "").strip() for w in words if (w.get("word") or "").strip())
+    # words_in_block already yields stripped, non-empty words
+    return " ".join(words)
+
+TEXT_BLOCKS = {"Text","Title","List"}
 
-def csv_to_markdown_table(csv_path: Path, max_cols=30, max_rows=50):
+def attach_block_text(records: list[dict], words_by_page: dict):
+    """
+    Set rec["_text"] on every text-like block that has a bbox, querying all blocks of a
+    page against its words at once.
+    """
+    by_page = {}
+    for rec in records:
+        if rec.get("block_type","Unknown") in TEXT_BLOCKS and rec.get("bbox_norm"):
+            by_page.setdefault(rec["page"], []).append(rec)
+    for page, recs in by_page.items():
+        wp = words_by_page.get(page)
+        if not wp:
+            for rec in recs:
+                rec["_text"] = ""
+            continue
+        # blocks sharing a bbox (e.g. the same region from two layout backends) are looked up once
+        keys = [tuple(_box(r["bbox_norm"])) for r in recs]
+        uniq = list(dict.fromkeys(keys))
+        word = wp["word"]
+        texts = {k: " ".join(word[idx].tolist())
+                 for k, idx in zip(uniq, block_word_indices(wp, np.array(uniq, dtype=np.float64)))}
+        for rec, k in zip(recs, keys):
+            rec["_text"] = texts[k]
+
+@lru_cache(maxsize=None)
+def _read_csv(path_str: str, header):
+    """pd.read_csv memoized by path; callers must not mutate the returned frame."""
+    return pd.read_csv(path_str, header=header)
+
+def read_table_csv(csv_path: Path) -> pd.DataFrame:
+    """Read a table CSV with a header row, falling back to headerless (cached across exporters)."""
     try:
-        df = pd.read_csv(csv_path, header=0)
+        return _read_csv(str(csv_path), 0)
     except Exception:
-        try:
-            df = pd.read_csv(csv_path, header=None)
-        except Exception:
-            return f"\n> [table: could not read `{csv_path}`]\n"
-    if df.shape[1] > max_cols:
-        df = df.iloc[:, :max_cols]
-    if df.shape[0] > max_rows:
-        df = df.iloc[:max_rows, :]
+        return _read_csv(str(csv_path), None)
+
+def csv_to_markdown_table(csv_path: Path, max_cols=30, max_rows=50, buf=None, counts=None):
+    """
+    Render a CSV as a Markdown pipe table; streams into buf if given, else returns the string.
+    counts: optional md_* counter dict (see export_one) updated with what was written.
+    """
+    out = buf if buf is not None else io.StringIO()
+    w = out.write
+    try:
+        df = read_table_csv(csv_path)
+    except Exception:
+        msg = f"\n> [table: could not read `{csv_path}`]\n"
+        w(msg)
+        if counts is not None:
+            _tally_md(counts, msg)
+        return None if buf is not None else out.getvalue()
+    # truncate first, in one slice, so only the rendered cells are stringified below
+    if df.shape[0] > max_rows or df.shape[1] > max_cols:
+        df = df.iloc[:max_rows, :max_cols]
     # convert to MD pipe table
     cols = [str(c) if c is not None else "" for c in (df.columns.tolist())]
-    header = "| " + " | ".join(cols) + " |"
-    sep = "| " + " | ".join(["---"]*len(cols)) + " |"
-    body_lines = []
-    for _, row in df.iterrows():
-        body_lines.append("| " + " | ".join("" if pd.isna(v) else str(v) for v in row.tolist()) + " |")
-    return "\n".join([header, sep] + body_lines) + "\n"
+    # cells render as iterrows() did: each row takes the frame's common dtype (so an int next to a
+    # float column reads "3.0"), NA -> ""; one to_numpy() instead of a Series per row
+    vals = df.to_numpy()
+    cells = [["" if na else str(v) for v, na in zip(row, na_row)]
+             for row, na_row in zip(vals.tolist(), pd.isna(vals).tolist())]
+    table = "".join(["| " + " | ".join(row) + " |\n"
+                     for row in [cols, ["---"]*len(cols), *cells]])
+    w(table)
+    if counts is not None:
+        nlines = len(cells) + 2
+        if table.count("\n") == nlines:  # no multi-line cells: every row is one pipe-table line
+            counts["md_tables"] += nlines
+            counts["md_figs"] += table.count("![")
+        else:
+            _tally_md(counts, table)
+    return None if buf is not None else out.getvalue()
+
+def resolve_table_csv(doc_id: str, page, prov: dict) -> Path | None:
+    """First existing CSV named in provenance, else a per-page fallback from the tables dir."""
+    for c in prov.get("table_csvs", []) or []:
+        p = _norm_path(c)
+        if _path_exists(str(p)):
+            return p
+    return _fallback_table_csv(doc_id, page)
+
+def _iter_staged_records(doc_id: str):
+    """Yield staged records from one bulk read split on newlines (no per-line file iteration)."""
+    data = (STAGED_ROOT / f"{doc_id}.jsonl").read_bytes()
+    for line in data.split(b"\n"):
+        if line.strip():
+            yield _loads(line)
+
+def load_staged_records(doc_id: str) -> list[dict]:
+    return list(_iter_staged_records(doc_id))
 
 def doc_ids_to_export():
     # export only docs that have staged jsonl
     return sorted(p.stem for p in STAGED_ROOT.glob("*.jsonl"))
 
-# -------- core exporters --------
-def export_markdown_for_doc(doc_id: str):
-    words_by_page = load_words_by_page(doc_id)
-    in_jsonl = STAGED_ROOT / f"{doc_id}.jsonl"
+# -------- core exporter --------
+def export_one(doc_id: str):
+    """
+    Render Markdown, JSON and plain text for one doc in a single pass over its staged records.
+    Returns the retrieval-metric counters for the written outputs (see _format_metrics).
+    """
+    staged = STAGED_ROOT / f"{doc_id}.jsonl"
+    if not staged.exists():
+        print(f"[skip] missing staged: {staged}")
+        return None
     out_dir = OUT_ROOT / doc_id
     out_dir.mkdir(parents=True, exist_ok=True)
-    out_md = out_dir / f"{doc_id}.md"
-
-    lines = []
-    lines.append(f"# {doc_id}\n")
-
-    # group staged records by page, preserve order
-    by_page = {}
-    with open(in_jsonl, "r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-            by_page.setdefault(rec["page"], []).append(rec)
 
-    for page in sorted(by_page.keys()):
-        lines.append(f"\n## Page {page}\n")
-        for rec in by_page[page]:
-            btype = rec.get("block_type","Unknown")
-            bbox  = rec.get("bbox_norm")
-            prov  = rec.get("provenance", {})
-            # reconstruct text from words within bbox (for text-like blocks)
-            text = ""
-            if btype in {"Text","Title","List"} and bbox:
-                words_page = words_by_page.get(page, [])
-                text = words_to_text(words_in_block(words_page, bbox))
-
-            if btype == "Title":
-                lines.append(f"\n### {text}\n" if text else "\n### (Title)\n")
-            elif btype == "List":
-                # naive: split by "•" or periods; if none, write as a single bullet
-                items = [t.strip() for t in text.split("•") if t.strip()] or ([text] if text else [])
-                for it in items:
-                    lines.append(f"- {it}")
-                if items:
-                    lines.append("")
-            elif btype == "Text":
-                if text:
-                    lines.append(text + "\n")
-            elif btype == "Table":
-                table_csvs = prov.get("table_csvs", []) or []
-                if table_csvs:
-                    # pick the first CSV for this block (often 1:1)
-                    lines.append(csv_to_markdown_table(Path(table_csvs[0])))
-                else:
-                    lines.append("> [table placeholder — no CSV found]\n")
-            elif btype == "Figure":
-                figs = prov.get("figure_pngs", []) or []
-                if figs:
-                    # embed first figure
-                    rel = figs[0]
-                    lines.append(f"![figure]({rel})\n")
-                else:
-                    lines.append("> [figure placeholder — no PNG found]\n")
+    records = load_staged_records(doc_id)
+    words_by_page = load_words_by_page(doc_id)
+    attach_block_text(records, words_by_page)
+
+    # Every fragment is written followed by "\n"; the trailing one is dropped at the end
+    md_by_page = {}        # markdown is grouped by page; JSON/TXT keep file order
+    json_out = []
+    txt = io.StringIO()    # plain text baseline: block texts, tables as TSV-ish rows
+    tw = txt.write
+    # md/txt counters are tallied per written fragment so nothing is re-scanned afterwards
+    counts = dict.fromkeys(_JSON_COUNT_KEYS + _MD_COUNT_KEYS + _STAGED_COUNT_KEYS + ("txt_cells",), 0)
+    counts["words_total"] = sum(len(v["word"]) for v in words_by_page.values())
+
+    for rec in records:
+        page = rec["page"]
+        btype = rec.get("block_type","Unknown")
+        bbox  = rec.get("bbox_norm")
+        prov  = rec.get("provenance", {})
+        md = md_by_page.get(page)
+        if md is None:
+            md = md_by_page[page] = io.StringIO()
+        mw = md.write
+
+        block = {
+            "doc_id": rec["doc_id"],
+            "page": page,
+            "type": btype,
+            "bbox_norm": bbox,
+            "sources": rec.get("sources"),
+            "ocr_used_on_page": rec.get("ocr_used_on_page", False),
+            "provenance": prov
+        }
+
+        # text reconstructed from words within bbox (for text-like blocks)
+        text = ""
+        if "_text" in rec:
+            text = rec["_text"]
+            block["text"] = text
+            if text:
+                tw(text); tw("\n")
+                if "\t" in text:
+                    counts["txt_cells"] += _txt_cells(text)
+
+        if btype == "Title":
+            mw(f"\n### {text}\n\n" if text else "\n### (Title)\n\n")
+            counts["md_headings"] += 1
+            _tally_md_after_prefix(counts, text)
+        elif btype == "List":
+            # naive: split by "•" or periods; if none, write as a single bullet
+            items = [t.strip() for t in text.split("•") if t.strip()] or ([text] if text else [])
+            for it in items:
+                mw(f"- {it}\n")
+                _tally_md_after_prefix(counts, it)
+            if items:
+                mw("\n")
+        elif btype == "Text":
+            if text:
+                mw(text); mw("\n\n")
+                _tally_md(counts, text + "\n")
+        elif btype == "Table":
+            table_csvs = prov.get("table_csvs", []) or []
+            if table_csvs:
+                # pick the first CSV for this block (often 1:1)
+                csv_to_markdown_table(Path(table_csvs[0]), buf=md, counts=counts)
+                mw("\n")
             else:
-                # Unknown/Other
-                if text:
-                    lines.append(text + "\n")
-
-    out_md.write_text("\n".join(lines), encoding="utf-8")
+                mw("> [table placeholder — no CSV found]\n\n")
+
+            counts["tables_in_staged"] += 1
+            csv_path = resolve_table_csv(doc_id, page, prov)
+            if csv_path:
+                df = read_table_csv(csv_path)
+                counts["cells_in_staged_est"] += df.shape[0] * df.shape[1]
+                # stringify once (NA -> "") and reuse the rows for both JSON and the TSV lines
+                rows = df.fillna("").astype(str).to_numpy().tolist()
+                block["table"] = {"rows": rows, "source_csv": str(csv_path)}
+                for row in rows:
+                    line = "\t".join(row)
+                    tw(line); tw("\n")
+                    if "\t" in line:
+                        counts["txt_cells"] += _txt_cells(line)
+            else:
+                block["table"] = {"rows": [], "source_csv": None, "note": f"missing CSV for page {page}"}
+                tw(f"[TABLE missing for page {page}]\n")
+        elif btype == "Figure":
+            figs = prov.get("figure_pngs", []) or []
+            if figs:
+                # embed first figure
+                rel = figs[0]
+                frag = f"![figure]({rel})\n\n"
+                mw(frag)
+                _tally_md(counts, frag)
+            else:
+                mw("> [figure placeholder — no PNG found]\n\n")
+            block["figure"] = {"paths": figs}
+            tw("[FIGURE]\n")
+        else:
+            # Unknown/Other
+            if text:
+                mw(text); mw("\n\n")
+                _tally_md(counts, text + "\n")
+
+        json_out.append(block)
+        _tally_json_block(counts, block)
+
+    # Assemble the Markdown as UTF-8 straight into one bytearray: page buffers are encoded once
+    # and appended in place instead of being copied into a second StringIO and re-encoded
+    header = f"# {doc_id}\n\n"
+    md_buf = bytearray(header.encode("utf-8"))
+    md_len = len(header)
+    _tally_md(counts, f"# {doc_id}\n")
+    for page in sorted(md_by_page.keys()):
+        page_md = f"\n## Page {page}\n\n" + md_by_page[page].getvalue()
+        md_buf += page_md.encode("utf-8")
+        md_len += len(page_md)
+    counts["md_headings"] += len(md_by_page)
+    del md_buf[-1:]  # every fragment ends in "\n"; drop the trailing one (a single byte)
+    out_md = out_dir / f"{doc_id}.md"
+    out_md.write_bytes(md_buf)
     print(f"✓ Markdown → {out_md}")
 
-def export_json_for_doc(doc_id: str):
-    words_by_page = load_words_by_page(doc_id)
-    in_jsonl = STAGED_ROOT / f"{doc_id}.jsonl"
-    out_dir = OUT_ROOT / doc_id
-    out_dir.mkdir(parents=True, exist_ok=True)
+    json_bytes = _dumps_indented(json_out)
     out_json = out_dir / f"{doc_id}.json"
-
-    out = []
-    with open(in_jsonl, "r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-            page = rec["page"]
-            btype = rec.get("block_type","Unknown")
-            bbox  = rec.get("bbox_norm")
-            prov  = rec.get("provenance", {})
-
-            block = {
-                "doc_id": rec["doc_id"],
-                "page": page,
-                "type": btype,
-                "bbox_norm": bbox,
-                "sources": rec.get("sources"),
-                "ocr_used_on_page": rec.get("ocr_used_on_page", False),
-                "provenance": prov
-            }
-
-            # Attach content depending on type
-            if btype in {"Text","Title","List"} and bbox:
-                words_page = words_by_page.get(page, [])
-                txt = words_to_text(words_in_block(words_page, bbox))
-                block["text"] = txt
-
-            if btype == "Table":
-                table_csvs = prov.get("table_csvs", []) or []
-                csv_path = None
-                for c in table_csvs:
-                    p = _norm_path(c)
-                    if p.exists():
-                        csv_path = p
-                        break
-                if csv_path is None:
-                    csv_path = _fallback_table_csv(doc_id, page)
-
-                if csv_path and csv_path.exists():
-                    try:
-                        df = pd.read_csv(csv_path, header=0)
-                    except Exception:
-                        df = pd.read_csv(csv_path, header=None)
-                    block["table"] = {"rows": df.fillna("").astype(str).values.tolist(),
-                                        "source_csv": str(csv_path)}
-                else:
-                    block["table"] = {"rows": [], "source_csv": None, "note": f"missing CSV for page {page}"}
-
-            if btype == "Figure":
-                figs = prov.get("figure_pngs", []) or []
-                block["figure"] = {"paths": figs}
-
-            out.append(block)
-
-    out_json.write_text(json.dumps(out, ensure_ascii=False, indent=2), encoding="utf-8")
+    out_json.write_bytes(json_bytes)
     print(f"✓ JSON → {out_json}")
 
-def export_text_for_doc(doc_id: str):
-    """Plain text baseline: just concatenate block texts and render tables as TSV-ish."""
-    words_by_page = load_words_by_page(doc_id)
-    in_jsonl = STAGED_ROOT / f"{doc_id}.jsonl"
-    out_dir = OUT_ROOT / doc_id
-    out_dir.mkdir(parents=True, exist_ok=True)
+    txt_str = txt.getvalue()
+    txt_bytes = txt_str.encode("utf-8")
+    txt_view = memoryview(txt_bytes)[:-1]  # drop the trailing "\n" without copying
     out_txt = out_dir / f"{doc_id}.txt"
-
-    lines = []
-    with open(in_jsonl, "r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-            page = rec["page"]
-            btype = rec.get("block_type","Unknown")
-            bbox  = rec.get("bbox_norm")
-            prov  = rec.get("provenance", {})
-
-            if btype in {"Title","Text","List"} and bbox:
-                words_page = words_by_page.get(page, [])
-                txt = words_to_text(words_in_block(words_page, bbox))
-                if txt:
-                    lines.append(txt)
-
-            if btype == "Table":
-                table_csvs = prov.get("table_csvs", []) or []
-                csv_path = None
-                for c in table_csvs:
-                    p = _norm_path(c)
-                    if p.exists():
-                        csv_path = p
-                        break
-                if csv_path is None:
-                    csv_path = _fallback_table_csv(doc_id, page)
-
-                if csv_path and csv_path.exists():
-                    try:
-                        df = pd.read_csv(csv_path, header=0)
-                    except Exception:
-                        df = pd.read_csv(csv_path, header=None)
-                    for _, row in df.iterrows():
-                        lines.append("\t".join("" if pd.isna(v) else str(v) for v in row.tolist()))
-                else:
-                    lines.append(f"[TABLE missing for page {page}]")
-
-            if btype == "Figure":
-                lines.append("[FIGURE]")
-
-    out_txt.write_text("\n".join(lines), encoding="utf-8")
+    out_txt.write_bytes(txt_view)
     print(f"✓ TXT → {out_txt}")
 
-def export_one(doc_id: str):
-    staged = STAGED_ROOT / f"{doc_id}.jsonl"
-    if not staged.exists():
-        print(f"[skip] missing staged: {staged}")
-        return
-    (OUT_ROOT / doc_id).mkdir(parents=True, exist_ok=True)
-    export_markdown_for_doc(doc_id)
-    export_json_for_doc(doc_id)
-    export_text_for_doc(doc_id)
+    # sizes come from the buffers we just wrote, so the comparison never reads them back
+    counts.update(md_len=md_len - 1, md_bytes=len(md_buf), json_bytes=len(json_bytes),
+                  txt_len=max(0, len(txt_str) - 1), txt_bytes=txt_view.nbytes)
+    # the memo only pays off within one doc (MD/JSON/TXT reuse each frame); drop it so pool
+    # workers don't keep every exported doc's tables alive
+    _read_csv.cache_clear()
+    return counts
 
 # ===================== NEW: Retrieval Comparison Logic =====================
 
-def _estimate_full_text_len(words_by_page: dict[int, list[dict]]) -> int:
+def _count_words_fast(doc_id: str) -> int:
+    """Number of records in the words JSONL, counted from raw newlines without decoding any JSON."""
+    p = PARSED_ROOT / doc_id / f"{doc_id}_words.jsonl"
+    if not p.exists():
+        return 0
+    data = p.read_bytes()
+    return data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+
+def _estimate_full_text_len(total_words: int) -> int:
     """Approximate total source text length from OCR words."""
-    total_words = sum(len(v) for v in words_by_page.values())
     # average word length ~5 incl. spaces; conservative multiplier
     return total_words * 6
 
@@ -300,29 +455,15 @@ def _count_tables_and_cells_from_staged(doc_id: str) -> tuple[int, int]:
     tcount, cells = 0, 0
     if not in_jsonl.exists():
         return 0, 0
-    with open(in_jsonl, "r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-            if rec.get("block_type") != "Table":
-                continue
-            tcount += 1
-            prov = rec.get("provenance", {}) or {}
-            page = rec.get("page")
-            csv_path = None
-            for c in prov.get("table_csvs", []) or []:
-                p = _norm_path(c)
-                if p.exists():
-                    csv_path = p
-                    break
-            if csv_path is None:
-                csv_path = _fallback_table_csv(doc_id, page)
-            if csv_path and csv_path.exists():
-                try:
-                    df = pd.read_csv(csv_path, header=0)
-                except Exception:
-                    df = pd.read_csv(csv_path, header=None)
-                r, c = df.shape
-                cells += int(r) * int(c)
+    for rec in _iter_staged_records(doc_id):
+        if rec.get("block_type") != "Table":
+            continue
+        tcount += 1
+        prov = rec.get("provenance", {}) or {}
+        csv_path = resolve_table_csv(doc_id, rec.get("page"), prov)
+        if csv_path:
+            r, c = read_table_csv(csv_path).shape
+            cells += int(r) * int(c)
     return tcount, cells
 
 def _load_export_paths(doc_id: str) -> dict:
@@ -333,80 +474,123 @@ def _load_export_paths(doc_id: str) -> dict:
         "txt": out_dir / f"{doc_id}.txt",
     }
 
-def _format_metrics(doc_id: str) -> dict:
-    """Compute comparable retrieval metrics for md/json/txt outputs."""
-    words_by_page = load_words_by_page(doc_id)
-    full_len_est = _estimate_full_text_len(words_by_page)
-    tcount, cells_est = _count_tables_and_cells_from_staged(doc_id)
-    paths = _load_export_paths(doc_id)
+_STAGED_COUNT_KEYS = ("tables_in_staged", "cells_in_staged_est")
+_JSON_COUNT_KEYS = ("json_text_len", "json_titles", "json_texts", "json_lists",
+                    "json_tables_cells", "json_figs")
+
+def _tally_json_block(c: dict, b: dict):
+    """Add one exported JSON block to the json_* counters."""
+    if "text" in b and isinstance(b["text"], str):
+        c["json_text_len"] += len(b["text"])
+    t = (b.get("type") or "").lower()
+    if t == "title":
+        c["json_titles"] += 1
+    elif t == "text":
+        c["json_texts"] += 1
+    elif t == "list":
+        c["json_lists"] += 1
+    if "table" in b and isinstance(b["table"], dict):
+        rows = b["table"].get("rows") or []
+        # rows is list[list]; count cells
+        if rows and isinstance(rows, list) and isinstance(rows[0], list):
+            r = len(rows)
+            c["json_tables_cells"] += r * max((len(rw) for rw in rows), default=0)
+    if "figure" in b:
+        paths_ = (b["figure"] or {}).get("paths") or []
+        c["json_figs"] += 1 if paths_ else 0
+
+_MD_COUNT_KEYS = ("md_headings", "md_tables", "md_figs")
+_RE_MD_HEADING = re.compile(r"^#{1,6}\s", re.MULTILINE)
+_RE_MD_TABLE = re.compile(r"^\|\s.*\s\|$", re.MULTILINE)
+
+def _tally_md(c: dict, s: str):
+    """Add heading/pipe-table/figure counts for a Markdown fragment that starts on a fresh line."""
+    if "#" in s:
+        c["md_headings"] += len(_RE_MD_HEADING.findall(s))
+    if "|" in s:
+        c["md_tables"] += len(_RE_MD_TABLE.findall(s))
+    c["md_figs"] += s.count("![")
+
+def _tally_md_after_prefix(c: dict, text: str):
+    """Like _tally_md for text written after a '### '/'- ' prefix: its first line is already classified."""
+    head, nl, rest = text.partition("\n")
+    c["md_figs"] += head.count("![")
+    if nl:
+        _tally_md(c, rest + "\n")
+
+def _md_counts(md: str) -> dict:
+    return {
+        "md_len": len(md),
+        "md_headings": len(_RE_MD_HEADING.findall(md)),
+        "md_tables": len(_RE_MD_TABLE.findall(md)),
+        "md_figs": md.count("!["),  # fixed substring, no regex needed
+    }
+
+def _txt_cells(txt: str) -> int:
+    # tables rendered as TSV lines (count with tabs)
+    tsv_lines = [ln for ln in txt.splitlines() if "\t" in ln and not ln.strip().startswith("[TABLE")]
+    # approximate cells: sum columns per TSV line
+    return sum(max(1, ln.count("\t") + 1) for ln in tsv_lines)
+
+def _counts_from_outputs(paths: dict) -> dict:
+    """Rebuild the export counters by reading the written files back (exports from an earlier run)."""
+    md = paths["md"].read_text(encoding="utf-8") if paths["md"].exists() else ""
+    jraw = paths["json"].read_text(encoding="utf-8") if paths["json"].exists() else ""
+    txt = paths["txt"].read_text(encoding="utf-8") if paths["txt"].exists() else ""
+    jdata = []
+    if jraw:
+        try:
+            jdata = json.loads(jraw)
+        except Exception:
+            jdata = []
+    counts = dict.fromkeys(_JSON_COUNT_KEYS, 0)
+    for b in jdata:
+        _tally_json_block(counts, b)
+    size = lambda p: os.path.getsize(p) if p.exists() else 0  # one stat instead of re-encoding
+    counts.update(_md_counts(md), md_bytes=size(paths["md"]), json_bytes=size(paths["json"]),
+                  txt_len=len(txt), txt_bytes=size(paths["txt"]), txt_cells=_txt_cells(txt))
+    return counts
+
+def _format_metrics(doc_id: str, counts: dict | None = None) -> dict:
+    """
+    Compute comparable retrieval metrics for md/json/txt outputs.
+    counts: counters returned by export_one; read back from disk when not given.
+    """
+    c = counts if counts is not None else _counts_from_outputs(_load_export_paths(doc_id))
+    # export_one counted the parsed words; otherwise count lines rather than parsing the JSONL
+    total_words = c["words_total"] if "words_total" in c else _count_words_fast(doc_id)
+    full_len_est = _estimate_full_text_len(total_words)
+    # export_one counted the staged tables while rendering them; otherwise re-read the CSVs
+    if "tables_in_staged" in c:
+        tcount, cells_est = c["tables_in_staged"], c["cells_in_staged_est"]
+    else:
+        tcount, cells_est = _count_tables_and_cells_from_staged(doc_id)
 
     metrics = {}
     # Markdown
-    md_len = (paths["md"].read_text(encoding="utf-8") if paths["md"].exists() else "")
-    md_headings = len(re.findall(r"^#{1,6}\s", md_len, flags=re.MULTILINE))
-    md_tables = len(re.findall(r"^\|\s.*\s\|$", md_len, flags=re.MULTILINE))
-    md_figs = len(re.findall(r"!\[", md_len))
     metrics["markdown"] = {
-        "bytes": len(md_len.encode("utf-8")) if md_len else 0,
-        "text_coverage_ratio": (len(md_len) / max(1, full_len_est)) if md_len else 0.0,
-        "structure_signals": md_headings + md_tables,  # chunking cues
+        "bytes": c["md_bytes"],
+        "text_coverage_ratio": c["md_len"] / max(1, full_len_est),
+        "structure_signals": c["md_headings"] + c["md_tables"],  # chunking cues
         "tables_cells_est": cells_est,  # we render tables; use staged-derived cells
-        "fig_refs": md_figs,
+        "fig_refs": c["md_figs"],
     }
 
     # JSON
-    jdata = []
-    if paths["json"].exists():
-        try:
-            jdata = json.loads(paths["json"].read_text(encoding="utf-8"))
-        except Exception:
-            jdata = []
-    json_text_len = 0
-    json_titles = json_texts = json_lists = 0
-    json_tables_cells = 0
-    json_figs = 0
-    for b in jdata:
-        if "text" in b and isinstance(b["text"], str):
-            json_text_len += len(b["text"])
-        t = (b.get("type") or "").lower()
-        if t == "title":
-            json_titles += 1
-        elif t == "text":
-            json_texts += 1
-        elif t == "list":
-            json_lists += 1
-        if "table" in b and isinstance(b["table"], dict):
-            rows = b["table"].get("rows") or []
-            # rows is list[list]; count cells
-            if rows and isinstance(rows, list) and isinstance(rows[0], list):
-                r = len(rows)
-                c = max((len(rw) for rw in rows), default=0)
-                json_tables_cells += r * c
-        if "figure" in b:
-            paths_ = (b["figure"] or {}).get("paths") or []
-            json_figs += 1 if paths_ else 0
     metrics["json"] = {
-        "bytes": len((paths["json"].read_text(encoding="utf-8") if paths["json"].exists() else "").encode("utf-8")),
-        "text_coverage_ratio": (json_text_len / max(1, full_len_est)),
-        "structure_signals": json_titles + json_texts + json_lists,  # typed blocks usable as metadata
-        "tables_cells_est": max(json_tables_cells, cells_est),  # prefer explicit count
-        "fig_refs": json_figs,
+        "bytes": c["json_bytes"],
+        "text_coverage_ratio": (c["json_text_len"] / max(1, full_len_est)),
+        "structure_signals": c["json_titles"] + c["json_texts"] + c["json_lists"],  # typed blocks usable as metadata
+        "tables_cells_est": max(c["json_tables_cells"], cells_est),  # prefer explicit count
+        "fig_refs": c["json_figs"],
     }
 
     # TXT
-    txt = (paths["txt"].read_text(encoding="utf-8") if paths["txt"].exists() else "")
-    # tables rendered as TSV lines (count with tabs)
-    tsv_lines = [ln for ln in txt.splitlines() if "\t" in ln and not ln.strip().startswith("[TABLE")]
-    # approximate cells: sum columns per TSV line
-    txt_cells = 0
-    for ln in tsv_lines:
-        txt_cells += max(1, ln.count("\t") + 1)
-
     metrics["txt"] = {
-        "bytes": len(txt.encode("utf-8")) if txt else 0,
-        "text_coverage_ratio": (len(txt) / max(1, full_len_est)) if txt else 0.0,
+        "bytes": c["txt_bytes"],
+        "text_coverage_ratio": c["txt_len"] / max(1, full_len_est),
         "structure_signals": 0,  # flat text
-        "tables_cells_est": txt_cells,
+        "tables_cells_est": c["txt_cells"],
         "fig_refs": 0,  # figures not preserved
     }
 
@@ -457,11 +641,12 @@ def _score_formats(metrics: dict, use_case: str = "semantic_search") -> dict:
     winner = max(scores.items(), key=lambda kv: kv[1])[0]
     return {"scores": scores, "winner": winner, "use_case": use_case}
 
-def compare_formats_for_doc(doc_id: str, use_case: str = "semantic_search") -> dict:
+def compare_formats_for_doc(doc_id: str, use_case: str = "semantic_search",
+                            counts: dict | None = None) -> dict:
     """
     Public API: compute metrics + score + recommendation for one doc.
     """
-    metrics = _format_metrics(doc_id)
+    metrics = _format_metrics(doc_id, counts)
     verdict = _score_formats(metrics, use_case=use_case)
     return {
         "doc_id": doc_id,
@@ -476,14 +661,24 @@ def compare_formats_for_doc(doc_id: str, use_case: str = "semantic_search") -> d
         },
     }
 
-def compare_all_docs(ids: list[str], use_case: str = "semantic_search") -> pd.DataFrame:
+COMPARISON_FIELDS = ["doc_id", "use_case", "winner", "score_markdown", "score_json", "score_txt",
+                     "text_cov_md", "text_cov_json", "text_cov_txt",
+                     "struct_md", "struct_json", "struct_txt",
+                     "tables_cells_md", "tables_cells_json", "tables_cells_txt",
+                     "tables_in_staged", "cells_in_staged_est"]
+
+def compare_all_docs(ids: list[str], use_case: str = "semantic_search",
+                     counts: dict | None = None) -> pd.DataFrame:
     """
     Run comparison across all docs and persist reports (CSV + JSON).
+    counts: optional {doc_id: export_one() counters}; docs without them are read back from disk.
     """
     results = []
     blob = []
-    for doc_id in ids:
-        r = compare_formats_for_doc(doc_id, use_case=use_case)
+    # with export_one's counters scoring is plain arithmetic, so run it here (a pool would only
+    # re-read in fresh processes what the export workers already parsed)
+    verdicts = [compare_formats_for_doc(d, use_case, (counts or {}).get(d)) for d in ids]
+    for doc_id, r in zip(ids, verdicts):
         blob.append(r)
         s = r["scores"]
         pm = r["metrics"]["potential"]
@@ -506,35 +701,41 @@ def compare_all_docs(ids: list[str], use_case: str = "semantic_search") -> pd.Da
             "tables_in_staged": pm["tables_in_staged"],
             "cells_in_staged_est": pm["cells_in_staged_est"],
         })
-    df = pd.DataFrame(results)
     OUT_ROOT.mkdir(parents=True, exist_ok=True)
-    (OUT_ROOT / "_comparison.csv").write_text(df.to_csv(index=False), encoding="utf-8")
-    (OUT_ROOT / "_comparison.json").write_text(json.dumps(blob, ensure_ascii=False, indent=2), encoding="utf-8")
+    # fixed schema: stream the rows straight to disk instead of DataFrame -> str -> file
+    with (OUT_ROOT / "_comparison.csv").open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=COMPARISON_FIELDS, lineterminator="\n")
+        w.writeheader()
+        w.writerows(results)
+    (OUT_ROOT / "_comparison.json").write_bytes(_dumps_indented(blob))
     print(f"✓ Comparison report → {OUT_ROOT / '_comparison.csv'}")
     print(f"✓ Comparison details → {OUT_ROOT / '_comparison.json'}")
     # Print a small human-readable summary
-    if not df.empty:
-        summary = df[["doc_id","winner","score_markdown","score_json","score_txt"]]
+    if results:
         print("\n== Retrieval Format Recommendation ==")
-        for _, row in summary.iterrows():
+        for row in results:
             print(f"- {row['doc_id']}: {row['winner']} "
                   f"(md={row['score_markdown']:.3f}, json={row['score_json']:.3f}, txt={row['score_txt']:.3f})")
-    return df
+    return pd.DataFrame(results, columns=COMPARISON_FIELDS)
 
 # ===================== /NEW =====================
 
+def _export_job(doc_id: str):
+    print(f"\n== Exporting {doc_id} ==")
+    return export_one(doc_id)
+
 def main(use_case: str = "semantic_search"):
     OUT_ROOT.mkdir(parents=True, exist_ok=True)
     ids = doc_ids_to_export()
     if not ids:
         print("No staged docs found in data/staged/*.jsonl")
         return
-    for doc_id in ids:
-        print(f"\n== Exporting {doc_id} ==")
-        export_one(doc_id)
+    # Docs are independent (own inputs, own output dir), so export them in parallel
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(ids))) as ex:
+        counts = dict(zip(ids, ex.map(_export_job, ids)))
     # After exporting, compare formats for retrieval and print/store a recommendation
     print(f"\n== Comparing formats for downstream retrieval (use_case='{use_case}') ==")
-    compare_all_docs(ids, use_case=use_case)
+    compare_all_docs(ids, use_case=use_case, counts=counts)
 
 if __name__ == "__main__":
     # Choose from: "semantic_search", "keyword_search", "table_qa"
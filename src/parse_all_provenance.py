@@ -1,21 +1,55 @@
 
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
+import csv
 import json
+import os
+import threading
 import pdfplumber
 import fitz  # PyMuPDF
-import pytesseract
-from PIL import Image
 import numpy as np
-import pandas as pd
+
+# pages and PDFs are already parallel here; keep Tesseract's OpenMP to one thread per call. Set before
+# Tesseract is loaded (the OpenMP runtime reads it once), inherited by workers and tesseract subprocesses
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+try:
+    import tesserocr  # in-process Tesseract API: model loaded once per thread, no subprocess per page
+    pytesseract = None
+except ImportError:  # fall back to pytesseract (one tesseract subprocess per page)
+    tesserocr = None
+    import pytesseract
+
+try:
+    import orjson
+except ImportError:  # fall back to stdlib json
+    orjson = None
+
+def _dumps_line(obj) -> bytes:
+    """Compact UTF-8 JSON bytes for one JSONL line (orjson when installed, stdlib json otherwise)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
 
 # ---------------- Config ----------------
 IN_DIR = Path("data/upload")
 OUT_ROOT = Path("data/parsed")
 MIN_WORDS = 10        # trigger OCR if fewer words
 MIN_CHARS = 50        # or too few characters
-DPI = 300             # render DPI for OCR (higher = slower, better)
+DPI = 200             # render DPI for OCR (pixels, and OCR time, scale with DPI²)
+DPI_RETRY = 300       # re-OCR at this DPI when the first pass finds fewer than MIN_WORDS
 LANG = "eng"          # Tesseract lang
 TESSERACT_CMD = ""    # Windows: r"C:\Program Files\Tesseract-OCR\tesseract.exe" (leave "" if in PATH)
+OCR_WORKERS = min(4, os.cpu_count() or 1)  # max pages OCR'd concurrently per PDF
+OCR_STRIP_PAGES = 1   # >1: OCR this many flagged pages per Tesseract call, stacked into one tall image
+                      # (amortizes per-call setup on PDFs with many small scanned pages; Tesseract's
+                      # layout analysis then sees the strip as one page, so it stays opt-in)
+OCR_STRIP_GAP = 64    # white rows between stacked pages (px)
+TEXT_BACKEND = "pdfplumber"  # or "pymupdf": fitz words/text, much faster on born-digital PDFs
+                             # (pdfplumber then only parses pages with drawings, for tables)
+TABLE_SETTINGS = {"vertical_strategy": "lines", "horizontal_strategy": "lines"}  # pdfplumber defaults
 
 # -------------- Helpers -----------------
 def ensure_dirs(out_base: Path):
@@ -33,60 +67,191 @@ def normalize_bbox(x0, y0, x1, y1, width, height, origin="top-left"):
         ny1 = 1.0 - (y0 / height)
     return {"x0": nx0, "y0": ny0, "x1": nx1, "y1": ny1}
 
-def write_word(out_f, file_id, page_num, text, bbox_norm, source, conf=None):
-    out_f.write(json.dumps({
+def word_record(file_id, page_num, text, bbox_norm, source, conf=None) -> dict:
+    return {
         "file_id": file_id,
         "page": page_num,
         "word": text,
         "bbox_norm": bbox_norm,
         "source": source,
         "conf": conf
-    }, ensure_ascii=False) + "\n")
+    }
+
+def write_words(out_f, records: list[dict]):
+    """Append a page's word records to a binary JSONL handle in one write."""
+    if records:
+        out_f.write(b"\n".join(map(_dumps_line, records)) + b"\n")
+
+_OCR_THREADS = OCR_WORKERS    # OCR threads in this process (split across PDF processes by _init_worker)
+_FITZ_LOCK = threading.Lock()  # a fitz Document must not be used from two threads at once
+_TESS = threading.local()      # per-thread tesserocr APIs (one API must not be shared across threads)
+
+def _tesserocr_data(samples: bytes, width: int, height: int, n: int, lang=LANG) -> dict:
+    """OCR raw pixels with this thread's PyTessBaseAPI -> image_to_data-style dict of lists."""
+    apis = getattr(_TESS, "apis", None)
+    if apis is None:
+        apis = _TESS.apis = {}
+    api = apis.get(lang)
+    if api is None:
+        api = apis[lang] = tesserocr.PyTessBaseAPI(lang=lang)
+    api.SetImageBytes(samples, width, height, n, width * n)
+    # same TSV rows tesseract writes for image_to_data: level..word_num, left, top, width, height, conf, text
+    data = {"left": [], "top": [], "width": [], "height": [], "conf": [], "text": []}
+    for row in (api.GetTSVText(0) or "").splitlines():
+        f = row.split("\t", 11)
+        if len(f) < 12:
+            continue
+        data["left"].append(int(f[6])); data["top"].append(int(f[7]))
+        data["width"].append(int(f[8])); data["height"].append(int(f[9]))
+        data["conf"].append(f[10]); data["text"].append(f[11])
+    return data
 
-def ocr_page_words(pdf_path: Path, page_num: int, dpi=DPI, lang=LANG):
-    """Render page with PyMuPDF and OCR with Tesseract -> word boxes + conf."""
+@lru_cache(maxsize=None)
+def _zoom_matrix(dpi: int):
+    """One shared fitz.Matrix per render DPI (DPI and DPI_RETRY), not one per page."""
+    return fitz.Matrix(dpi / 72.0, dpi / 72.0)
+
+def _render(doc, page_num: int, dpi: int) -> np.ndarray:
+    """Render one page of a shared fitz doc -> HxW grayscale uint8 view of the pixmap samples."""
+    # only the render touches the shared doc; tesseract runs outside the lock.
+    # Tesseract binarizes a gray image anyway, so render 1 byte/pixel instead of RGB
+    mat = _zoom_matrix(dpi)
+    with _FITZ_LOCK:
+        pix = doc[page_num - 1].get_pixmap(matrix=mat, alpha=False, colorspace=fitz.csGRAY)
+    shape = (pix.height, pix.width) if pix.n == 1 else (pix.height, pix.width, pix.n)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(shape)
+
+def _ocr_data(img: np.ndarray, lang=LANG) -> dict:
+    """OCR an HxW (gray) or HxWxN image -> image_to_data-style dict of lists."""
+    if tesserocr is not None:
+        h, w = img.shape[:2]
+        n = img.shape[2] if img.ndim == 3 else 1
+        # a rendered page is a view over the pixmap's bytes already; stacked strips need one copy
+        samples = img
+        while isinstance(samples, np.ndarray):
+            samples = samples.base
+        if not (isinstance(samples, bytes) and len(samples) == img.nbytes):
+            samples = img.tobytes()
+        return _tesserocr_data(samples, w, h, n, lang)
     if TESSERACT_CMD:
         pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
-    doc = fitz.open(str(pdf_path))
-    page = doc[page_num - 1]
-    zoom = dpi / 72.0
-    mat = fitz.Matrix(zoom, zoom)
-    pix = page.get_pixmap(matrix=mat, alpha=False)
-    width, height = pix.width, pix.height
-    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-    arr = np.array(img)
-    data = pytesseract.image_to_data(arr, lang=lang, output_type=pytesseract.Output.DICT)
-    words = []
-    for i in range(len(data["text"])):
-        t = (data["text"][i] or "").strip()
-        if not t:
-            continue
-        x, y, w, h = data["left"][i], data["top"][i], data["width"][i], data["height"][i]
-        conf = None
-        try:
-            conf_val = float(data["conf"][i])
-            conf = conf_val if conf_val >= 0 else None
-        except:
-            pass
-        words.append((t, x, y, x + w, y + h, width, height, conf))
+    # the ndarray goes straight to pytesseract (no PIL image, no extra copy)
+    return pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
+
+def _words_from_data(data: dict, width: int, height: int, y_off: int = 0):
+    """image_to_data dict -> [(word, bbox_norm, conf)], boxes normalized to a width x height page
+    whose top edge sits at y_off in the OCR'd image."""
+    # column-wise: drop blank tokens, then normalize all boxes with array ops
+    texts = [(t or "").strip() for t in data["text"]]
+    keep = np.array([bool(t) for t in texts], dtype=bool)
+    x, y, w, h = np.array([data["left"], data["top"], data["width"], data["height"]],
+                          dtype=np.float64).reshape(4, -1)[:, keep]
+    y -= y_off
+    boxes = np.stack([x / width, y / height, (x + w) / width, (y + h) / height], axis=1).tolist()
+    try:
+        conf = np.asarray(data["conf"], dtype=np.float64)[keep].tolist()
+    except (TypeError, ValueError):  # unparsable entries -> None, as before
+        conf = [_parse_conf(c) for c, k in zip(data["conf"], keep) if k]
+    return [
+        (t, {"x0": x0, "y0": y0, "x1": x1, "y1": y1}, c if c is not None and c >= 0 else None)
+        for t, (x0, y0, x1, y1), c in zip((t for t in texts if t), boxes, conf)
+    ]
+
+def ocr_page_words(doc, page_num: int, dpi=DPI, lang=LANG):
+    """Render page of an open fitz doc and OCR with Tesseract -> [(word, bbox_norm, conf)]."""
+    img = _render(doc, page_num, dpi)
+    words = _words_from_data(_ocr_data(img, lang), img.shape[1], img.shape[0])
+    if len(words) < MIN_WORDS and dpi < DPI_RETRY:
+        return ocr_page_words(doc, page_num, dpi=DPI_RETRY, lang=lang)
     return words
 
-def extract_tables_plumber(pdf_path: Path, tables_dir: Path):
+def ocr_strip_words(doc, page_nums: list[int], dpi=DPI, lang=LANG):
+    """OCR several pages as one tall strip image (one Tesseract call) -> per-page word lists."""
+    imgs = [_render(doc, p, dpi) for p in page_nums]
+    width = max(im.shape[1] for im in imgs)
+    # white gap between pages so Tesseract never merges lines across a page break
+    tops, y = [], 0
+    for im in imgs:
+        tops.append(y)
+        y += im.shape[0] + OCR_STRIP_GAP
+    strip = np.full((y - OCR_STRIP_GAP, width) + imgs[0].shape[2:], 255, dtype=np.uint8)
+    for top, im in zip(tops, imgs):
+        strip[top:top + im.shape[0], :im.shape[1]] = im
+    data = _ocr_data(strip, lang)
+
+    # hand every token back to the page its top edge falls on
+    per_page = [{k: [] for k in ("left", "top", "width", "height", "conf", "text")} for _ in imgs]
+    cols = [data[k] for k in ("left", "top", "width", "height", "conf", "text")]
+    for row in zip(*cols):
+        d = per_page[max(bisect_right(tops, int(row[1])) - 1, 0)]
+        for k, v in zip(("left", "top", "width", "height", "conf", "text"), row):
+            d[k].append(v)
+
+    out = []
+    for p, top, im, d in zip(page_nums, tops, imgs, per_page):
+        words = _words_from_data(d, im.shape[1], im.shape[0], top)
+        if len(words) < MIN_WORDS and dpi < DPI_RETRY:
+            words = ocr_page_words(doc, p, dpi=DPI_RETRY, lang=lang)  # retry sparse pages alone
+        out.append(words)
+    return out
+
+def _parse_conf(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+def extract_tables_plumber(page, p_i: int, tables_dir: Path) -> int:
+    """Save one pdfplumber page's tables as table_p{p_i}_{t_i}.csv; returns how many were saved."""
     saved = 0
-    with pdfplumber.open(pdf_path) as pdf:
-        for p_i, page in enumerate(pdf.pages, start=1):
-            try:
-                tbls = page.extract_tables()
-                for t_i, tbl in enumerate(tbls, start=1):
-                    df = pd.DataFrame(tbl)
-                    # pdfplumber returns headerless matrices; keep raw
-                    out_csv = tables_dir / f"table_p{p_i}_{t_i}.csv"
-                    df.to_csv(out_csv, index=False, header=False)
-                    saved += 1
-            except Exception:
-                continue
+    try:
+        # the default "lines" strategies only build tables from ruling edges; a page without any
+        # lines/rects/curves cannot have one, so skip the TableFinder entirely
+        if not (page.lines or page.rects or page.curves):
+            return 0
+        tbls = [t.extract() for t in page.find_tables(TABLE_SETTINGS).tables]
+        for t_i, tbl in enumerate(tbls, start=1):
+            # pdfplumber returns headerless matrices; keep raw (ragged rows padded like a DataFrame)
+            ncols = max((len(r) for r in tbl), default=0)
+            out_csv = tables_dir / f"table_p{p_i}_{t_i}.csv"
+            with open(out_csv, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f, lineterminator="\n").writerows(list(r) + [None] * (ncols - len(r)) for r in tbl)
+            saved += 1
+    except Exception:
+        pass
     return saved
 
+def release_page(page):
+    """Drop a pdfplumber page's parsed layout (else it lives until the PDF is closed)."""
+    if hasattr(page, "close"):
+        page.close()
+    else:  # older pdfplumber
+        page.flush_cache()
+
+def plumber_page_text(page):
+    """pdfplumber -> ([(text, x0, top, x1, bottom)], page text, width, height)."""
+    # words, text and tables all read the page's cached char/edge objects; a page with no
+    # text layer at all (a scan) has nothing to cluster, so skip both clustering passes
+    if not page.chars:
+        return [], "", page.width, page.height
+    page_text = page.extract_text() or ""
+    # words are built from these chars, so fewer than MIN_CHARS of them means the page goes to
+    # OCR whatever extract_words would find; skip the words pass
+    if sum(len(c["text"]) for c in page.chars) < MIN_CHARS:
+        return [], page_text, page.width, page.height
+    words = page.extract_words(use_text_flow=True, keep_blank_chars=False)
+    return ([(w.get("text") or "", w["x0"], w["top"], w["x1"], w["bottom"]) for w in words],
+            page_text, page.width, page.height)
+
+def fitz_page_text(page):
+    """PyMuPDF -> same shape as plumber_page_text (fitz coords are top-left origin too)."""
+    page_text = page.get_text()
+    if len(page_text) < MIN_CHARS:  # word text is a subset of it -> OCR page, skip the words pass
+        return [], page_text, page.rect.width, page.rect.height
+    words = page.get_text("words")  # (x0, y0, x1, y1, text, block_no, line_no, word_no)
+    return ([(w[4], w[0], w[1], w[2], w[3]) for w in words],
+            page_text, page.rect.width, page.rect.height)
+
 # -------------- Main per-PDF ------------
 def process_pdf(pdf_path: Path):
     file_id = pdf_path.stem
@@ -97,58 +262,110 @@ def process_pdf(pdf_path: Path):
     words_jsonl = out_base / f"{file_id}_words.jsonl"
     ocr_log_csv = out_base / "ocr_pages.csv"
 
-    # Text + word-level JSONL (plumber first, OCR fallback)
+    # Text + word-level JSONL (text layer first, OCR fallback) and tables in one page pass
     ocr_pages = []
-    with pdfplumber.open(pdf_path) as pdf, open(words_jsonl, "w", encoding="utf-8") as wf:
-        for i, page in enumerate(pdf.pages, start=1):
-            # ---- pdfplumber words ----
-            words = page.extract_words(use_text_flow=True, keep_blank_chars=False)
-            text_len = sum(len((w.get("text") or "")) for w in words)
-
-            # write page-level text file
-            page_text = page.extract_text() or ""
-            (pages_dir / f"page_{i}.txt").write_text(page_text, encoding="utf-8")
-
-            # Decide if this page needs OCR
-            needs_ocr = (len(words) < MIN_WORDS) or (text_len < MIN_CHARS)
-
-            if not needs_ocr:
-                # write word-level JSONL from pdfplumber
-                pw, ph = page.width, page.height
-                for w in words:
-                    t = (w.get("text") or "").strip()
-                    if not t:
-                        continue
-                    x0, x1 = w["x0"], w["x1"]
-                    y0, y1 = w["top"], w["bottom"]
-                    bbox = normalize_bbox(x0, y0, x1, y1, pw, ph, origin="top-left")
-                    write_word(wf, file_id, i, t, bbox, "pdfplumber", None)
-            else:
-                ocr_pages.append(i)
-
-    # OCR pass for flagged pages (word boxes + conf)
-    if ocr_pages:
-        with open(words_jsonl, "a", encoding="utf-8") as wf:
-            for p in ocr_pages:
-                for (t, x0, y0, x1, y1, W, H, conf) in ocr_page_words(pdf_path, p):
-                    bbox = normalize_bbox(x0, y0, x1, y1, W, H, origin="top-left")
-                    write_word(wf, file_id, p, t, bbox, "ocr", conf)
+    saved = 0
+
+    def text_page(i, page_text_fn, page, source):
+        words, page_text, pw, ph = page_text_fn(page)
+        text_len = sum(len(w[0]) for w in words)
 
+        # write page-level text file
+        (pages_dir / f"page_{i}.txt").write_text(page_text, encoding="utf-8")
+
+        # Decide if this page needs OCR
+        if (len(words) < MIN_WORDS) or (text_len < MIN_CHARS):
+            ocr_pages.append(i)
+            return
+        # write word-level JSONL from the text layer; boxes normalized (top-left origin) as one
+        # array divide, like the OCR path, instead of a normalize_bbox call per word
+        kept = [(t, w) for t, w in zip((w[0].strip() for w in words), words) if t]
+        if not kept:
+            return
+        xy = (np.array([w[1:5] for _, w in kept], dtype=np.float64) / (pw, ph, pw, ph)).tolist()
+        write_words(wf, [word_record(file_id, i, t, {"x0": x0, "y0": y0, "x1": x1, "y1": y1},
+                                     source, None)
+                         for (t, _), (x0, y0, x1, y1) in zip(kept, xy)])
+
+    # one handle (1 MiB buffer) for both the text-layer and the OCR pass
+    with open(words_jsonl, "wb", buffering=1 << 20) as wf:
+        if TEXT_BACKEND == "pymupdf":
+            with fitz.open(str(pdf_path)) as doc:
+                pdf = None
+                try:
+                    for i, page in enumerate(doc, start=1):
+                        text_page(i, fitz_page_text, page, "pymupdf")
+                        # tables need ruling edges; only pages that draw something go to pdfplumber
+                        if page.get_drawings():
+                            pdf = pdf or pdfplumber.open(pdf_path)
+                            ppage = pdf.pages[i - 1]
+                            saved += extract_tables_plumber(ppage, i, tables_dir)
+                            release_page(ppage)
+                finally:
+                    if pdf is not None:
+                        pdf.close()
+        else:
+            with pdfplumber.open(pdf_path) as pdf:
+                for i, page in enumerate(pdf.pages, start=1):
+                    text_page(i, plumber_page_text, page, "pdfplumber")
+                    # Tables via pdfplumber, reusing the already-parsed page
+                    saved += extract_tables_plumber(page, i, tables_dir)
+                    release_page(page)
+
+        # OCR pass for flagged pages (word boxes + conf), appended through the same handle
+        if ocr_pages:
+            # one fitz doc for all OCR pages; OCR itself runs outside the GIL (tesserocr releases it,
+            # pytesseract waits on a subprocess), so pages overlap in threads. map keeps page order
+            # and only this thread writes the JSONL
+            doc = fitz.open(str(pdf_path))
+            try:
+                with ThreadPoolExecutor(max_workers=min(_OCR_THREADS, len(ocr_pages))) as ex:
+                    if OCR_STRIP_PAGES > 1:
+                        batches = [ocr_pages[k:k + OCR_STRIP_PAGES]
+                                   for k in range(0, len(ocr_pages), OCR_STRIP_PAGES)]
+                        results = (w for ws in ex.map(partial(ocr_strip_words, doc), batches) for w in ws)
+                    else:
+                        results = ex.map(partial(ocr_page_words, doc), ocr_pages)
+                    for p, page_words in zip(ocr_pages, results):
+                        write_words(wf, [word_record(file_id, p, t, bbox, "ocr", conf)
+                                         for t, bbox, conf in page_words])
+            finally:
+                doc.close()
+
+    if ocr_pages:
         # Save a simple log of which pages required OCR
-        pd.DataFrame({"page": ocr_pages}).to_csv(ocr_log_csv, index=False)
+        with open(ocr_log_csv, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f, lineterminator="\n").writerows([["page"], *[[p] for p in ocr_pages]])
 
-    # Tables via pdfplumber
-    saved = extract_tables_plumber(pdf_path, tables_dir)
     print(f"✓ {pdf_path.name}: text → {pages_dir}, words → {words_jsonl}, tables → {saved} CSV(s)")
 
+def iter_pdfs(root: Path):
+    """Yield every *.pdf (any case) under root; one scandir per directory, no per-entry stat."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name.lower().endswith(".pdf"):
+                    yield Path(e.path)
+
+def _init_worker(n_procs: int):
+    """PDF worker initializer: share the cores between the processes' OCR threads."""
+    global _OCR_THREADS
+    _OCR_THREADS = max(1, min(OCR_WORKERS, (os.cpu_count() or 1) // n_procs))
+
 def main():
-    pdfs = sorted(IN_DIR.rglob("*.pdf"))
+    pdfs = sorted(iter_pdfs(IN_DIR)) if IN_DIR.is_dir() else []
     if not pdfs:
         print("No PDFs found in data/uploads/. Add a PDF and rerun.")
         return
     OUT_ROOT.mkdir(parents=True, exist_ok=True)
-    for pdf in pdfs:
-        process_pdf(pdf)
+    # PDFs are independent (own output dir) and CPU-bound, so fan out one per core;
+    # jobs are heavy and uneven, hence chunksize=1. Each worker prints its own ✓ line.
+    n_procs = min(os.cpu_count() or 1, len(pdfs))
+    with ProcessPoolExecutor(max_workers=n_procs, initializer=_init_worker, initargs=(n_procs,)) as ex:
+        list(ex.map(process_pdf, pdfs, chunksize=1))
 
 if __name__ == "__main__":
     main()
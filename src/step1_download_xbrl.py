@@ -5,12 +5,26 @@ This script downloads XBRL attachments for Apple's latest 10-K filing
 """
 
 from pathlib import Path
-from sec_edgar_downloader import Downloader
+import asyncio
+import importlib.util
+import os
 import shutil
 import sys
 import json
 from datetime import datetime
 
+try:
+    import httpx  # concurrent attachment download straight from the EDGAR archive
+except ImportError:  # fall back to sec-edgar-downloader (serial)
+    httpx = None
+    from sec_edgar_downloader import Downloader
+
+CIK = "0000320193"  # Apple Inc.
+SUBMISSIONS_URL = f"https://data.sec.gov/submissions/CIK{CIK}.json"
+ARCHIVE_URL = "https://www.sec.gov/Archives/edgar/data/{cik}/{acc}"
+MAX_REQUESTS = 10  # SEC fair-access limit: 10 requests/second (also the in-flight cap)
+HTTP2 = importlib.util.find_spec("h2") is not None  # httpx needs the h2 package for HTTP/2
+
 def setup_directories():
     """Create necessary directories"""
     dirs = [
@@ -22,6 +36,56 @@ def setup_directories():
         dir_path.mkdir(parents=True, exist_ok=True)
     return dirs[0]  # Return xbrl_dir
 
+class _RateLimiter:
+    """Spaces request starts at least 1/per_second apart (the semaphore only caps concurrency)"""
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            delay = self.next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.next_at = loop.time() + self.interval
+
+async def _fetch(url, client, sem, limiter):
+    async with sem:
+        await limiter.wait()
+        r = await client.get(url)
+        r.raise_for_status()
+        return r.content
+
+async def _download_filing(your_email, your_institution, form, after, before=None):
+    """Fetch the latest AAPL `form` filed in [after, before] and save its .xml/.xsd attachments
+    under sec-edgar-filings/AAPL/<form>/<accession>/ (same layout as sec-edgar-downloader)."""
+    headers = {"User-Agent": f"{your_institution} {your_email}"}
+    async with httpx.AsyncClient(http2=HTTP2, headers=headers, timeout=60, follow_redirects=True,
+                                 limits=httpx.Limits(max_connections=MAX_REQUESTS)) as client:
+        sem = asyncio.Semaphore(MAX_REQUESTS)
+        limiter = _RateLimiter(MAX_REQUESTS)
+        recent = json.loads(await _fetch(SUBMISSIONS_URL, client, sem, limiter))["filings"]["recent"]
+        # newest first, like Downloader.get(limit=1)
+        for f, acc, date in zip(recent["form"], recent["accessionNumber"], recent["filingDate"]):
+            if f == form and date >= after and (before is None or date <= before):
+                break
+        else:
+            raise LookupError(f"no {form} filed after {after}")
+
+        base = ARCHIVE_URL.format(cik=int(CIK), acc=acc.replace("-", ""))
+        index = json.loads(await _fetch(f"{base}/index.json", client, sem, limiter))
+        names = [it["name"] for it in index["directory"]["item"]
+                 if it["name"].lower().endswith((".xml", ".xsd"))]
+        bodies = await asyncio.gather(*(_fetch(f"{base}/{n}", client, sem, limiter) for n in names))
+
+    out_dir = Path("sec-edgar-filings/AAPL") / form / acc
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for n, body in zip(names, bodies):
+        (out_dir / n).write_bytes(body)
+    return len(names)
+
 def download_apple_xbrl(your_email, your_institution="Northeastern University"):
     """
     Download Apple's XBRL files from SEC EDGAR
@@ -47,35 +111,44 @@ def download_apple_xbrl(your_email, your_institution="Northeastern University"):
     
     # Initialize SEC EDGAR downloader
     print("\n[1/4] Initializing SEC EDGAR downloader...")
-    try:
-        dl = Downloader(
-            company_name=your_institution,
-            email_address=your_email
-        )
-        print("✓ Downloader initialized successfully")
-    except Exception as e:
-        print(f"✗ Failed to initialize: {e}")
-        return None, []
+    if httpx is not None:
+        def get(form, after, before=None):
+            asyncio.run(_download_filing(your_email, your_institution, form, after, before))
+        print(f"✓ Concurrent EDGAR client ready (httpx, HTTP/{'2' if HTTP2 else '1.1'})")
+    else:
+        try:
+            dl = Downloader(
+                company_name=your_institution,
+                email_address=your_email
+            )
+            print("✓ Downloader initialized successfully")
+        except Exception as e:
+            print(f"✗ Failed to initialize: {e}")
+            return None, []
+
+        def get(form, after, before=None):
+            dl.get(
+                form,
+                "AAPL",                    # Apple ticker
+                limit=1,                   # Most recent filing
+                download_details=True,     # Get all attachments including XBRL
+                after=after,
+                before=before
+            )
     
     # Download Apple's 10-K with XBRL
     print("\n[2/4] Downloading Apple's 10-K filing from SEC...")
-    print("      (This may take 30-60 seconds)")
+    if httpx is None:
+        print("      (This may take 30-60 seconds)")
     
     try:
-        dl.get(
-            "10-K",                    # Annual report
-            "AAPL",                    # Apple ticker
-            limit=1,                   # Most recent filing
-            download_details=True,     # Get all attachments including XBRL
-            after="2023-01-01",       # Recent filings
-            before="2024-12-31"
-        )
+        get("10-K", after="2023-01-01", before="2024-12-31")  # Annual report, recent filings
         print("✓ Download completed")
     except Exception as e:
         print(f"✗ Download failed: {e}")
         print("\nTrying alternative: 10-Q filing...")
         try:
-            dl.get("10-Q", "AAPL", limit=1, download_details=True, after="2023-01-01")
+            get("10-Q", after="2023-01-01")
             print("✓ Downloaded 10-Q instead")
         except:
             print("✗ Both 10-K and 10-Q downloads failed")
@@ -119,10 +192,12 @@ def download_apple_xbrl(your_email, your_institution="Northeastern University"):
                 
                 if file.suffix == '.xml':
                     try:
-                        content = file.read_text(encoding='utf-8', errors='ignore')[:2000]
-                        if any(marker in content.lower() for marker in ['xbrl', 'instance', 'context']):
+                        # sniff the raw head; markers are ASCII so no decode is needed
+                        with open(file, 'rb') as fh:
+                            head = fh.read(2000).lower()
+                        if any(marker in head for marker in (b'xbrl', b'instance', b'context')):
                             is_xbrl = True
-                    except:
+                    except OSError:
                         pass
                 elif file.suffix == '.xsd':
                     is_xbrl = True  # Schema files are part of XBRL
@@ -131,7 +206,14 @@ def download_apple_xbrl(your_email, your_institution="Northeastern University"):
                     # Copy to our xbrl directory
                     dest_name = f"AAPL_{filing_type}_{file.name}"
                     dest_path = xbrl_dir / dest_name
-                    shutil.copy2(file, dest_path)
+                    # hardlink (no data copied; the download is never modified afterwards),
+                    # copy across filesystems. Unlink first so a rerun never writes through a
+                    # link into an older download
+                    dest_path.unlink(missing_ok=True)
+                    try:
+                        os.link(file, dest_path)
+                    except OSError:
+                        shutil.copy2(file, dest_path)
                     xbrl_files.append(dest_path)
                     
                     # Check if this is the main instance document
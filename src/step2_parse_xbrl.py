@@ -9,7 +9,7 @@ import pandas as pd
 import json
 from datetime import datetime
 import sys
-from bs4 import BeautifulSoup
+from lxml import etree
 import re
 
 class AppleXBRLParser:
@@ -39,35 +39,40 @@ class AppleXBRLParser:
         self.financial_data = {}
         self.parsed_items = []
     
-    def parse_with_beautifulsoup_fy2024(self, xbrl_file):
-        """Parse XBRL and extract ONLY FY2024 data - IMPROVED VERSION"""
+    def parse_with_lxml_fy2024(self, xbrl_file):
+        """Parse XBRL and extract ONLY FY2024 data - IMPROVED VERSION (streaming lxml parse)"""
         print(f"\nParsing XBRL for FY2024 data only: {xbrl_file.name}")
         
         try:
-            with open(xbrl_file, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            soup = BeautifulSoup(content, 'xml')
-            
             # Step 1: Analyze ALL contexts to understand the structure
             contexts_fy2024 = {}
             all_contexts = {}
+            # facts (any element with a contextRef) as (contextRef, local name, text), in document
+            # order; matched once every context is known
+            facts = []
             
             print("  Analyzing ALL contexts...")
             
-            for context in soup.find_all('context'):
-                context_id = context.get('id')
-                if context_id:
-                    period = context.find('period')
-                    if period:
-                        end_date = period.find('endDate')
-                        start_date = period.find('startDate')
-                        instant = period.find('instant')
+            # one streaming pass; each context/fact is released once read, so memory stays flat
+            for _, elem in etree.iterparse(str(xbrl_file), events=('end',), huge_tree=True, recover=True):
+                if not isinstance(elem.tag, str):  # comments / processing instructions
+                    continue
+                context_ref = elem.get('contextRef')
+                if context_ref is not None:
+                    facts.append((context_ref, etree.QName(elem).localname,
+                                  elem.text if len(elem) == 0 else None))
+                elif etree.QName(elem).localname == 'context':
+                    context_id = elem.get('id')
+                    period = elem.find('.//{*}period')
+                    if context_id and period is not None:
+                        end_date = period.find('.//{*}endDate')
+                        start_date = period.find('.//{*}startDate')
+                        instant = period.find('.//{*}instant')
                         
                         period_info = {
-                            'start': start_date.text.strip() if start_date else None,
-                            'end': end_date.text.strip() if end_date else None,
-                            'instant': instant.text.strip() if instant else None
+                            'start': (start_date.text or '').strip() if start_date is not None else None,
+                            'end': (end_date.text or '').strip() if end_date is not None else None,
+                            'instant': (instant.text or '').strip() if instant is not None else None
                         }
                         all_contexts[context_id] = period_info
                         
@@ -76,6 +81,11 @@ class AppleXBRLParser:
                             print(f"    {context_id}: Start={period_info['start']} End={period_info['end']}")
                         elif period_info['instant']:
                             print(f"    {context_id}: Instant={period_info['instant']}")
+                else:
+                    continue  # period/entity children etc. are read when their context closes
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
             
             # Step 2: Identify FY2024 contexts more precisely
             print(f"\n  Identifying FY2024 contexts from {len(all_contexts)} total contexts...")
@@ -127,9 +137,7 @@ class AppleXBRLParser:
             items_found = 0
             context_usage = {}
             
-            for tag in soup.find_all(attrs={"contextRef": True}):
-                context_ref = tag.get('contextRef')
-                
+            for context_ref, tag_name, text in facts:
                 # Only process if this is a FY2024 context
                 if context_ref not in contexts_fy2024:
                     continue
@@ -139,8 +147,7 @@ class AppleXBRLParser:
                     context_usage[context_ref] = 0
                 context_usage[context_ref] += 1
                 
-                tag_name = tag.name
-                if not tag_name or not tag.string:
+                if not tag_name or not text:
                     continue
                 
                 # Check if this is a concept we want
@@ -151,7 +158,7 @@ class AppleXBRLParser:
                         
                         try:
                             # Extract value
-                            value_str = tag.string.strip()
+                            value_str = text.strip()
                             value_str = re.sub(r'[,$]', '', value_str)
                             value = float(value_str)
                             
@@ -222,9 +229,12 @@ class AppleXBRLParser:
             traceback.print_exc()
             return False
     
+    # original name kept for existing callers (rows keep their 'BeautifulSoup_FY2024_Improved' source too)
+    parse_with_beautifulsoup_fy2024 = parse_with_lxml_fy2024
+    
     def parse_file(self, xbrl_file):
         """Parse XBRL file for FY2024 data only"""
-        return self.parse_with_beautifulsoup_fy2024(xbrl_file)
+        return self.parse_with_lxml_fy2024(xbrl_file)
     
     def to_dataframe(self):
         """Convert to DataFrame"""